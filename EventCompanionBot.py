@@ -16,13 +16,23 @@ Dynamic UI:
 import os
 import re
 import json
+import queue
+import random
 import sqlite3
 import logging
+import logging.handlers
 import asyncio
+import string
+import time
 import secrets
+import functools
+import threading
 import urllib.parse
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
 from datetime import datetime, timedelta
-from typing import Optional, Dict, List, Tuple
+from typing import NamedTuple, Optional, Dict, List, Tuple
 from zoneinfo import ZoneInfo
 
 from dotenv import load_dotenv
@@ -36,8 +46,9 @@ from telegram import (
     KeyboardButton,
     ReplyKeyboardRemove,
 )
-from telegram.constants import ParseMode
+from telegram.constants import MessageEntityType, ParseMode
 from telegram.ext import (
+    AIORateLimiter,
     Application,
     CommandHandler,
     CallbackQueryHandler,
@@ -259,6 +270,12 @@ DEFAULT_UI: Dict[str, Dict[str, str]] = {
 
 _UI: Dict[str, Dict[str, str]] = {}
 
+# Flat lookup tables rebuilt by load_ui(): merged strings with defaults filled in.
+_TEXTS: Dict[str, str] = {}
+_BUTTONS: Dict[str, str] = {}
+_COMMANDS: Dict[str, str] = {}
+_BASE_CMDS: Dict[str, str] = {}
+
 
 def _deep_merge(base: dict, override: dict) -> dict:
     out = dict(base)
@@ -273,44 +290,117 @@ def _deep_merge(base: dict, override: dict) -> dict:
 def load_ui():
     """Load STRINGS_FILE over DEFAULT_UI, safely."""
     global _UI
-    _UI = json.loads(json.dumps(DEFAULT_UI))  # deep copy
+    _compile.cache_clear()
+    for fn in _UI_CACHED:
+        fn.cache_clear()
+    # DEFAULT_UI is never mutated, so _UI may share its nested dicts instead of copying them.
+    _UI = DEFAULT_UI
     try:
         if os.path.exists(STRINGS_FILE):
             with open(STRINGS_FILE, "r", encoding="utf-8") as f:
                 data = json.load(f)
             if isinstance(data, dict):
-                _UI = _deep_merge(_UI, data)
-        logger.info(f"UI loaded from {STRINGS_FILE}")
+                _UI = _deep_merge(DEFAULT_UI, data)
+        logger.info("UI loaded from %s", STRINGS_FILE)
     except Exception as e:
-        logger.warning(f"Failed to load UI file {STRINGS_FILE}: {e}")
-        _UI = json.loads(json.dumps(DEFAULT_UI))
+        logger.warning("Failed to load UI file %s: %s", STRINGS_FILE, e)
+        _UI = DEFAULT_UI
+    _rebuild_lookups()
+
+
+def _flatten(section: str) -> Dict[str, str]:
+    merged = _UI.get(section)
+    if not isinstance(merged, dict):
+        merged = {}
+    defaults = DEFAULT_UI[section]
+    out = {}
+    for k in {**defaults, **merged}:
+        v = merged.get(k) or defaults.get(k)
+        if v:
+            out[k] = str(v)
+    return out
+
+
+def _rebuild_lookups():
+    global _TEXTS, _BUTTONS, _COMMANDS, _BASE_CMDS
+    _TEXTS = _flatten("texts")
+    _BUTTONS = _flatten("buttons")
+    _COMMANDS = _flatten("commands")
+    _BASE_CMDS = {k: _COMMANDS.get(k) or k for k in ("start", "my_events", "help", "cancel")}
+
+
+_FORMATTER = string.Formatter()
+
+
+@functools.lru_cache(maxsize=512)
+def _compile(tmpl: str) -> Optional[Tuple[Tuple[str, Optional[str]], ...]]:
+    """
+    Parse a UI template once into (literal, field_name) parts.
+    Templates without fields collapse to a single literal part.
+    None means the template needs full str.format semantics (specs, conversions, indexing).
+    """
+    try:
+        parsed = list(_FORMATTER.parse(tmpl))
+    except ValueError:
+        return None
+    parts = []
+    for literal, name, spec, conversion in parsed:
+        if name is not None and (not name.isidentifier() or spec or conversion):
+            return None
+        parts.append((literal, name))
+    if all(name is None for _, name in parts):
+        return (("".join(literal for literal, _ in parts), None),)
+    return tuple(parts)
+
+
+def _is_static(parts: Optional[Tuple[Tuple[str, Optional[str]], ...]]) -> bool:
+    return parts is not None and len(parts) == 1 and parts[0][1] is None
+
+
+def _render(tmpl: str, values: Dict) -> str:
+    parts = _compile(tmpl)
+    if parts is None:
+        try:
+            return tmpl.format(**values)
+        except Exception:
+            return tmpl
+    out = []
+    for literal, name in parts:
+        out.append(literal)
+        if name is not None:
+            if name not in values:
+                return tmpl  # same as a failed .format(): show the raw template
+            out.append(str(values[name]))
+    return "".join(out)
 
 
 def cmd(key: str) -> str:
-    return str((_UI.get("commands") or {}).get(key) or (DEFAULT_UI["commands"].get(key) or key))
+    return _COMMANDS.get(key) or key
 
 
 def btn(key: str, **kwargs) -> str:
-    s = (_UI.get("buttons") or {}).get(key) or (DEFAULT_UI.get("buttons") or {}).get(key) or key
-    try:
-        return str(s).format(**kwargs)
-    except Exception:
-        return str(s)
+    return _render(_BUTTONS.get(key) or key, kwargs)
 
 
 def txt(key: str, **kwargs) -> str:
-    s = (_UI.get("texts") or {}).get(key) or (DEFAULT_UI.get("texts") or {}).get(key) or key
-    base = {
-        "start": cmd("start"),
-        "my_events": cmd("my_events"),
-        "help": cmd("help"),
-        "cancel": cmd("cancel"),
-    }
-    base.update(kwargs)
-    try:
-        return str(s).format(**base)
-    except Exception:
-        return str(s)
+    s = _TEXTS.get(key) or key
+    parts = _compile(s)
+    if _is_static(parts):
+        return parts[0][0]
+    return _render(s, {**_BASE_CMDS, **kwargs})
+
+
+# Builders whose result depends only on their arguments and the UI strings; load_ui() resets them.
+_UI_CACHED: List = []
+
+
+def ui_cached(fn):
+    cached = functools.lru_cache(maxsize=256)(fn)
+    _UI_CACHED.append(cached)
+    return cached
+
+
+_rebuild_lookups()
 
 
 # ----------------------------
@@ -326,46 +416,96 @@ def norm_username(u: Optional[str]) -> Optional[str]:
     return u.lstrip("@").strip().lower() or None
 
 
+class _KeepOnly(dict):
+    """str.translate table that deletes every character not explicitly listed."""
+
+    def __missing__(self, key):
+        return None
+
+
+_PHONE_TABLE = _KeepOnly({ord(c): c for c in "0123456789+"})
+
+
 def norm_phone(p: Optional[str]) -> Optional[str]:
     if not p:
         return None
-    p = p.strip().replace(" ", "").replace("-", "")
-    p = re.sub(r"[^0-9+]", "", p)
-    return p or None
+    return p.translate(_PHONE_TABLE) or None
+
+
+_EVENT_TIME_RE = re.compile(r"^(\d{4})-(\d{1,2})-(\d{1,2})\s+(\d{1,2}):(\d{1,2})$", re.ASCII)
+
+
+# "key: value" lines of the wifi / organizer forms; later lines win, as before.
+_WIFI_LINE_RE = re.compile(r"^(ssid|password):(.*)$", re.IGNORECASE | re.MULTILINE | re.ASCII)
+_ORG_LINE_RE = re.compile(r"^[^\S\n]*(name|phone|email|telegram)[^\S\n]*:(.*)$", re.IGNORECASE | re.MULTILINE | re.ASCII)
 
 
 def parse_event_time(text: str) -> Optional[datetime]:
     """
     Accepts: YYYY-MM-DD HH:MM
     """
-    text = text.strip()
+    m = _EVENT_TIME_RE.match(text.strip())
+    if not m:
+        return None
     try:
-        dt = datetime.strptime(text, "%Y-%m-%d %H:%M")
-        return dt.replace(tzinfo=APP_TZ)
-    except Exception:
+        return datetime(int(m[1]), int(m[2]), int(m[3]), int(m[4]), int(m[5]), tzinfo=APP_TZ)
+    except ValueError:
         return None
 
 
-def display_event_time(dt_iso: Optional[str]) -> str:
+@functools.lru_cache(maxsize=1024)
+def event_datetime(dt_iso: Optional[str]) -> Optional[datetime]:
+    """Stored ISO time (event_time, alert run_at) as an aware datetime; naive values are APP_TZ, None if unset or malformed."""
     if not dt_iso:
-        return "Not set"
+        return None
     try:
         dt = datetime.fromisoformat(dt_iso)
-        if dt.tzinfo is None:
-            dt = dt.replace(tzinfo=APP_TZ)
-        return dt.astimezone(APP_TZ).strftime("%Y-%m-%d %H:%M")
-    except Exception:
+    except ValueError:
+        return None
+    return dt if dt.tzinfo is not None else dt.replace(tzinfo=APP_TZ)
+
+
+@functools.lru_cache(maxsize=1024)
+def display_event_time(dt_iso: Optional[str]) -> str:
+    if not dt_iso:
+        return "Not set"
+    dt = event_datetime(dt_iso)
+    if dt is None:
         return dt_iso
+    return dt.astimezone(APP_TZ).strftime("%Y-%m-%d %H:%M")
+
+
+_HTML_TABLE = str.maketrans({"&": "&amp;", "<": "&lt;", ">": "&gt;"})
 
 
 def html_escape(s: str) -> str:
-    return (s or "").replace("&", "&amp;").replace("<", "&lt;").replace(">", "&gt;")
+    return (s or "").translate(_HTML_TABLE)
+
+
+# For strings rendered on every callback (event titles); arbitrary user text uses html_escape directly.
+_escape_cached = functools.lru_cache(maxsize=1024)(html_escape)
+
+
+_DANGLING_MARKUP_RE = re.compile(r"<[^>]*$|&#?\w*$")
+_HTML_TAG_RE = re.compile(r"<(/?)([a-zA-Z]+)[^>]*>")
 
 
 def clamp_caption(text: str, limit: int = 1024) -> str:
+    """
+    Truncate an HTML caption without leaving a cut tag/entity or an unclosed tag,
+    either of which makes Telegram reject the whole message.
+    """
     if len(text) <= limit:
         return text
-    return text[: limit - 3] + "..."
+    cut = _DANGLING_MARKUP_RE.sub("", text[: limit - 1])
+    open_tags: List[str] = []
+    for m in _HTML_TAG_RE.finditer(cut):
+        tag = m[2].lower()
+        if not m[1]:
+            open_tags.append(tag)
+        elif tag in open_tags:
+            del open_tags[len(open_tags) - 1 - open_tags[::-1].index(tag)]
+    return cut + "…" + "".join(f"</{t}>" for t in reversed(open_tags))
 
 
 async def safe_edit_or_send(
@@ -385,16 +525,25 @@ async def safe_edit_or_send(
         text = "…"  # safe fallback
 
     if update.callback_query and update.callback_query.message:
+        message = update.callback_query.message
+        # Re-pressing a button often renders exactly what is already shown; Telegram would
+        # answer "message is not modified", so skip the round-trip (markups are hashable).
+        render = (message.message_id, text, reply_markup, parse_mode, disable_web_page_preview)
+        chat_data = context.chat_data
+        if chat_data is not None and chat_data.get("last_render") == render:
+            return
         try:
-            await update.callback_query.message.edit_text(
+            await message.edit_text(
                 text=text,
                 reply_markup=reply_markup,
                 parse_mode=parse_mode,
                 disable_web_page_preview=disable_web_page_preview,
             )
+            if chat_data is not None:
+                chat_data["last_render"] = render
             return
         except Exception as e:
-            logger.debug(f"edit_text failed, fallback to send: {e}")
+            logger.debug("edit_text failed, fallback to send: %s", e)
 
     if update.effective_chat:
         await context.bot.send_message(
@@ -409,20 +558,333 @@ async def safe_edit_or_send(
 # ----------------------------
 # Database
 # ----------------------------
+class Event(NamedTuple):
+    event_id: str
+    event_name: Optional[str]
+    admin_id: int
+    created_at: Optional[str]
+
+    @property
+    def title(self) -> str:
+        return self.event_name or f"Event {self.event_id[:8]}"
+
+    @property
+    def title_html(self) -> str:
+        return _escape_cached(self.title)
+
+
+class EventContent(NamedTuple):
+    agenda: Optional[str] = None
+    wifi_ssid: Optional[str] = None
+    wifi_password: Optional[str] = None
+    organizer_name: Optional[str] = None
+    organizer_phone: Optional[str] = None
+    organizer_email: Optional[str] = None
+    organizer_telegram: Optional[str] = None
+    event_time: Optional[str] = None
+    event_location: Optional[str] = None
+    loc_lat: Optional[float] = None
+    loc_lon: Optional[float] = None
+
+
+EMPTY_CONTENT = EventContent()
+
+# SQL is kept in module constants so every call hits sqlite3's statement cache.
+SQL_INSERT_EVENT = "INSERT INTO events(event_id, event_name, admin_id, created_at) VALUES(?,?,?,?)"
+SQL_INSERT_EVENT_CONTENT = "INSERT OR IGNORE INTO event_content(event_id) VALUES(?)"
+SQL_DELETE_EVENT = "DELETE FROM events WHERE event_id=?"
+SQL_GET_EVENT = "SELECT event_id, event_name, admin_id, created_at FROM events WHERE event_id=?"
+SQL_ADMIN_EVENTS = "SELECT event_id, event_name, admin_id, created_at FROM events WHERE admin_id=? ORDER BY created_at DESC"
+SQL_PARTICIPATING_EVENTS = """
+SELECT e.event_id, e.event_name, e.admin_id, e.created_at
+FROM participants p
+JOIN events e ON e.event_id = p.event_id
+WHERE p.telegram_id = ?
+ORDER BY e.created_at DESC
+"""
+SQL_HUB_COUNTS = """
+SELECT
+    (SELECT COUNT(*) FROM events WHERE admin_id = ?),
+    (SELECT COUNT(*) FROM participants p JOIN events e ON e.event_id = p.event_id WHERE p.telegram_id = ?)
+"""
+SQL_GET_EVENT_CONTENT = """
+SELECT agenda, wifi_ssid, wifi_password,
+       organizer_name, organizer_phone, organizer_email, organizer_telegram,
+       event_time, event_location,
+       loc_lat, loc_lon
+FROM event_content WHERE event_id=?
+"""
+SQL_SET_AGENDA = "UPDATE event_content SET agenda=? WHERE event_id=?"
+SQL_SET_WIFI = "UPDATE event_content SET wifi_ssid=?, wifi_password=? WHERE event_id=?"
+SQL_SET_ORGANIZER_INFO = """
+UPDATE event_content
+SET organizer_name=?, organizer_phone=?, organizer_email=?, organizer_telegram=?
+WHERE event_id=?
+"""
+SQL_SET_TIME = "UPDATE event_content SET event_time=? WHERE event_id=?"
+SQL_SET_LOCATION = "UPDATE event_content SET event_location=? WHERE event_id=?"
+SQL_SET_MAP_PIN = "UPDATE event_content SET loc_lat=?, loc_lon=? WHERE event_id=?"
+SQL_CLEAR_MAP_PIN = "UPDATE event_content SET loc_lat=NULL, loc_lon=NULL WHERE event_id=?"
+SQL_UPSERT_PARTICIPANT_STUB = """
+INSERT INTO participants(event_id, telegram_id, username, first_name, last_name, registered_at)
+VALUES(?,?,?,?,?,?)
+ON CONFLICT(event_id, telegram_id) DO UPDATE SET
+    username=COALESCE(excluded.username, participants.username),
+    first_name=COALESCE(excluded.first_name, participants.first_name),
+    last_name=COALESCE(excluded.last_name, participants.last_name)
+"""
+SQL_GET_REGISTRATION = """
+SELECT full_name, phone_number, company_name
+FROM participants WHERE event_id=? AND telegram_id=?
+"""
+SQL_SET_REGISTRATION = """
+UPDATE participants
+SET full_name=?, phone_number=?, company_name=?
+WHERE event_id=? AND telegram_id=?
+"""
+SQL_LIST_MEMBERS = """
+SELECT telegram_id, username, first_name, last_name, full_name, phone_number, company_name, registered_at
+FROM participants
+WHERE event_id=?
+ORDER BY registered_at DESC, id DESC
+"""
+SQL_LEAVE_EVENT = "DELETE FROM participants WHERE event_id=? AND telegram_id=?"
+SQL_PARTICIPANT_IDS = "SELECT telegram_id FROM participants WHERE event_id=? AND telegram_id IS NOT NULL"
+SQL_INSERT_PHOTO = "INSERT INTO photos(event_id, file_id, caption, uploaded_at) VALUES(?,?,?,?)"
+SQL_GET_PHOTOS = "SELECT file_id, caption FROM photos WHERE event_id=? ORDER BY uploaded_at ASC"
+SQL_INSERT_QUESTION = """
+INSERT INTO anonymous_questions(event_id, sender_telegram_id, question_text, created_at, status)
+VALUES(?,?,?,?, 'new')
+"""
+SQL_LIST_QUESTIONS = """
+SELECT question_text AS text, COALESCE(SUBSTR(created_at, 1, 19), '') AS ts
+FROM anonymous_questions
+WHERE event_id=?
+ORDER BY created_at DESC
+LIMIT ?
+"""
+SQL_UPSERT_FEEDBACK = """
+INSERT INTO feedback(event_id, telegram_id, rating, comment, created_at)
+VALUES(?,?,?,?,?)
+ON CONFLICT(event_id, telegram_id) DO UPDATE SET
+    rating=excluded.rating,
+    comment=COALESCE(excluded.comment, feedback.comment),
+    created_at=excluded.created_at
+"""
+SQL_FEEDBACK_SUMMARY = "SELECT COALESCE(SUM(rating=1), 0), COALESCE(SUM(rating=-1), 0) FROM feedback WHERE event_id=?"
+SQL_FEEDBACK_COMMENTS = """
+SELECT telegram_id, rating, comment, created_at
+FROM feedback
+WHERE event_id=? AND comment IS NOT NULL AND TRIM(comment) != ''
+ORDER BY created_at DESC
+LIMIT ?
+"""
+SQL_LOAD_USER_STATES = "SELECT telegram_id, state, payload_json FROM user_state"
+SQL_DELETE_USER_STATE = "DELETE FROM user_state WHERE telegram_id=?"
+SQL_UPSERT_USER_STATE = """
+INSERT INTO user_state(telegram_id, state, payload_json, updated_at)
+VALUES(?,?,?,?)
+ON CONFLICT(telegram_id) DO UPDATE SET
+    state=excluded.state,
+    payload_json=excluded.payload_json,
+    updated_at=excluded.updated_at
+"""
+SQL_DELETE_USER_CONTEXT = "DELETE FROM user_context WHERE telegram_id=?"
+SQL_UPSERT_USER_CONTEXT = """
+INSERT INTO user_context(telegram_id, current_event_id, updated_at)
+VALUES(?,?,?)
+ON CONFLICT(telegram_id) DO UPDATE SET
+    current_event_id=excluded.current_event_id,
+    updated_at=excluded.updated_at
+"""
+SQL_GET_CURRENT_EVENT = "SELECT current_event_id FROM user_context WHERE telegram_id=?"
+SQL_CLEAR_USER_CONTEXT_FOR_EVENT = "DELETE FROM user_context WHERE telegram_id=? AND current_event_id=?"
+SQL_CLEAR_CONTEXTS_FOR_EVENT = "DELETE FROM user_context WHERE current_event_id=?"
+SQL_INSERT_ALERT = """
+INSERT INTO alerts(event_id, run_at_iso, minutes_before, created_by, status)
+VALUES(?,?,?,?, 'scheduled')
+"""
+SQL_FUTURE_ALERTS = """
+SELECT id, event_id, run_at_iso, minutes_before, created_by, status
+FROM alerts
+WHERE status='scheduled'
+"""
+SQL_MARK_ALERT_SENT = "UPDATE alerts SET status='sent' WHERE id=?"
+
+
+def _is_full_registration(row) -> bool:
+    if not row:
+        return False
+    full_name, phone, company = row
+    return bool((full_name or "").strip()) and bool((phone or "").strip()) and bool((company or "").strip())
+
+
+class LRUCache:
+    """
+    Small thread-safe LRU map for read-mostly rows.
+    put() is skipped when an invalidation happened after the caller's snapshot,
+    so a slow reader can never re-insert a row that a writer just changed.
+    """
+
+    def __init__(self, maxsize: int = 1024):
+        self.maxsize = maxsize
+        self._data: "OrderedDict[object, object]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.generation = 0
+
+    def get(self, key, default=None):
+        with self._lock:
+            if key not in self._data:
+                return default
+            self._data.move_to_end(key)
+            return self._data[key]
+
+    def put(self, key, value, generation: int):
+        with self._lock:
+            if generation != self.generation:
+                return
+            self._data[key] = value
+            self._data.move_to_end(key)
+            if len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+    def pop(self, key):
+        with self._lock:
+            self.generation += 1
+            self._data.pop(key, None)
+
+
 class Database:
-    def __init__(self, db_file: str):
+    # Methods that modify data; they run on a single writer thread (see _run).
+    WRITE_METHODS = frozenset(
+        {
+            "create_event",
+            "create_and_enter_event",
+            "delete_event",
+            "set_agenda",
+            "set_wifi",
+            "set_organizer_info",
+            "set_time",
+            "set_location",
+            "set_map_pin",
+            "clear_map_pin",
+            "ensure_participant_stub",
+            "enter_event",
+            "set_registration_info",
+            "leave_event",
+            "add_photos",
+            "add_question",
+            "set_feedback",
+            "save_user_states",
+            "set_current_event",
+            "add_alert",
+            "mark_alert_sent",
+            "mark_alerts_sent",
+            "maintain",
+        }
+    )
+
+    def __init__(self, db_file: str, pool_size: int = 4):
         self.db_file = db_file
+        # Connections are opened once and reused; PRAGMAs are applied at connect time only.
+        self._pool: "queue.Queue[sqlite3.Connection]" = queue.Queue(maxsize=pool_size)
+        for _ in range(pool_size):
+            self._pool.put(self._connect())
+        # The writer thread owns one long-lived connection, so writes never contend
+        # with each other for the WAL lock; reads keep using the pool.
+        self._writer = self._connect()
+        self._local = threading.local()
+        # Blocking sqlite calls are run here so handlers never stall the event loop.
+        self._executor = ThreadPoolExecutor(max_workers=pool_size, thread_name_prefix="db-read")
+        self._write_executor = ThreadPoolExecutor(
+            max_workers=1, thread_name_prefix="db-write", initializer=self._bind_writer
+        )
+        # Events change rarely; keep rows in memory and drop them from every mutator.
+        self._event_cache = LRUCache(maxsize=1024)
+        self._content_cache = LRUCache(maxsize=1024)
         self.init_db()
 
-    def get_connection(self):
-        conn = sqlite3.connect(self.db_file, timeout=30, check_same_thread=False)
+    def _invalidate_event(self, event_id: str):
+        self._event_cache.pop(event_id)
+        self._content_cache.pop(event_id)
+        pending = getattr(self._local, "invalidated", None)
+        if pending is not None:
+            # Inside transaction(): repeat once the changes are actually committed.
+            pending.append(event_id)
+
+    async def _run(self, fn, *args, **kwargs):
+        """Run a blocking Database method in the executor; writes are serialized on one thread."""
+        executor = self._write_executor if fn.__name__ in self.WRITE_METHODS else self._executor
+        return await asyncio.get_running_loop().run_in_executor(executor, functools.partial(fn, *args, **kwargs))
+
+    def _connect(self) -> sqlite3.Connection:
+        conn = sqlite3.connect(self.db_file, timeout=30, check_same_thread=False, cached_statements=256)
+        # Rows are returned as-is; sqlite3.Row gives name access without building a dict per row.
+        conn.row_factory = sqlite3.Row
         conn.execute("PRAGMA journal_mode=WAL;")
         conn.execute("PRAGMA foreign_keys=ON;")
         conn.execute("PRAGMA busy_timeout=30000;")
+        # WAL makes NORMAL crash-safe; commits no longer fsync, only checkpoints do.
+        conn.execute("PRAGMA synchronous=NORMAL;")
+        conn.execute("PRAGMA cache_size=-20000;")
+        conn.execute("PRAGMA temp_store=MEMORY;")
+        conn.execute("PRAGMA mmap_size=134217728;")
+        conn.execute("PRAGMA wal_autocheckpoint=1000;")
         return conn
 
+    def _bind_writer(self):
+        self._local.conn = self._writer
+
+    def _acquire(self) -> sqlite3.Connection:
+        writer = getattr(self._local, "conn", None)
+        return writer if writer is not None else self._pool.get()
+
+    def _release(self, conn: sqlite3.Connection):
+        if conn is not self._writer:
+            self._pool.put(conn)
+
+    @contextmanager
+    def conn(self):
+        """
+        Borrow a pooled connection (the dedicated writer connection on the write thread).
+        Commits on clean exit, rolls back on error, always returns it to the pool.
+        Inside transaction() it yields the open transaction's connection instead.
+        """
+        tx = getattr(self._local, "tx", None)
+        if tx is not None:
+            yield tx
+            return
+        conn = self._acquire()
+        try:
+            yield conn
+            conn.commit()
+        except BaseException:
+            conn.rollback()
+            raise
+        finally:
+            self._release(conn)
+
+    @contextmanager
+    def transaction(self):
+        """
+        Run several Database methods as one BEGIN IMMEDIATE ... COMMIT:
+        their own conn() blocks join this transaction instead of committing separately.
+        """
+        invalidated: List[str] = []
+        with self.conn() as conn:
+            conn.execute("BEGIN IMMEDIATE")
+            self._local.tx = conn
+            self._local.invalidated = invalidated
+            try:
+                yield conn
+            finally:
+                self._local.tx = None
+                self._local.invalidated = None
+        for event_id in invalidated:
+            self._invalidate_event(event_id)
+
     def init_db(self):
-        with self.get_connection() as conn:
+        with self.conn() as conn:
             cur = conn.cursor()
 
             cur.execute(
@@ -560,163 +1022,154 @@ class Database:
             )
 
             cur.execute("CREATE INDEX IF NOT EXISTS idx_events_admin ON events(admin_id)")
-            cur.execute("CREATE INDEX IF NOT EXISTS idx_participants_event ON participants(event_id)")
-            cur.execute("CREATE INDEX IF NOT EXISTS idx_photos_event ON photos(event_id)")
-            cur.execute("CREATE INDEX IF NOT EXISTS idx_questions_event ON anonymous_questions(event_id)")
-            cur.execute("CREATE INDEX IF NOT EXISTS idx_feedback_event ON feedback(event_id)")
+            # participants(event_id, ...) lookups are served by the UNIQUE(event_id, telegram_id) index.
+            cur.execute("DROP INDEX IF EXISTS idx_participants_event")
+            cur.execute("CREATE INDEX IF NOT EXISTS idx_participants_tg ON participants(telegram_id)")
+            # (event_id, timestamp) indexes serve both the filter and the ORDER BY of every list query,
+            # and make the single-column event_id indexes redundant.
+            cur.execute("CREATE INDEX IF NOT EXISTS idx_participants_event_regat ON participants(event_id, registered_at)")
+            cur.execute("DROP INDEX IF EXISTS idx_photos_event")
+            cur.execute("CREATE INDEX IF NOT EXISTS idx_photos_event_uploaded ON photos(event_id, uploaded_at)")
+            cur.execute("DROP INDEX IF EXISTS idx_questions_event")
+            cur.execute(
+                "CREATE INDEX IF NOT EXISTS idx_questions_event_created ON anonymous_questions(event_id, created_at)"
+            )
+            cur.execute("DROP INDEX IF EXISTS idx_feedback_event")
+            cur.execute("CREATE INDEX IF NOT EXISTS idx_feedback_event_created ON feedback(event_id, created_at)")
+            cur.execute("CREATE INDEX IF NOT EXISTS idx_feedback_tg ON feedback(telegram_id)")
             cur.execute("CREATE INDEX IF NOT EXISTS idx_alerts_runat ON alerts(run_at_iso)")
+            # Only scheduled alerts are ever looked up by status; index just those rows.
+            cur.execute("DROP INDEX IF EXISTS idx_alerts_status_runat")
+            cur.execute(
+                "CREATE INDEX IF NOT EXISTS idx_alerts_scheduled ON alerts(run_at_iso) WHERE status='scheduled'"
+            )
+
+            # Give the planner statistics once; `maintain()` keeps them fresh afterwards.
+            has_stats = cur.execute(
+                "SELECT 1 FROM sqlite_master WHERE type='table' AND name='sqlite_stat1'"
+            ).fetchone()
+            if not has_stats:
+                cur.execute("ANALYZE")
 
         logger.info("Database initialized")
 
+    def maintain(self):
+        """Refresh planner statistics and truncate the WAL file."""
+        with self.conn() as conn:
+            conn.execute("PRAGMA optimize")
+            conn.execute("PRAGMA wal_checkpoint(TRUNCATE)")
+
     # ---- Event methods ----
     def create_event(self, event_id: str, admin_id: int, event_name: str):
-        with self.get_connection() as conn:
+        with self.conn() as conn:
             cur = conn.cursor()
-            cur.execute(
-                "INSERT INTO events(event_id, event_name, admin_id, created_at) VALUES(?,?,?,?)",
-                (event_id, event_name, admin_id, now_ts()),
-            )
-            cur.execute("INSERT OR IGNORE INTO event_content(event_id) VALUES(?)", (event_id,))
+            cur.execute(SQL_INSERT_EVENT, (event_id, event_name, admin_id, now_ts()))
+            cur.execute(SQL_INSERT_EVENT_CONTENT, (event_id,))
+        self._invalidate_event(event_id)
+
+    def create_and_enter_event(
+        self,
+        event_id: str,
+        admin_id: int,
+        event_name: str,
+        username: Optional[str],
+        first_name: Optional[str],
+        last_name: Optional[str],
+    ):
+        """Create the event and enter it as its admin (participant stub + current event) in one commit."""
+        with self.transaction():
+            self.create_event(event_id, admin_id, event_name)
+            self.ensure_participant_stub(event_id, admin_id, username, first_name, last_name)
+            self.set_current_event(admin_id, event_id)
 
     def delete_event(self, event_id: str):
-        with self.get_connection() as conn:
-            conn.execute("DELETE FROM events WHERE event_id=?", (event_id,))
+        with self.conn() as conn:
+            conn.execute(SQL_DELETE_EVENT, (event_id,))
+            conn.execute(SQL_CLEAR_CONTEXTS_FOR_EVENT, (event_id,))
+        self._invalidate_event(event_id)
 
     def event_exists(self, event_id: str) -> bool:
-        with self.get_connection() as conn:
-            row = conn.execute("SELECT 1 FROM events WHERE event_id=?", (event_id,)).fetchone()
-            return bool(row)
-
-    def get_event(self, event_id: str) -> Optional[Dict]:
-        with self.get_connection() as conn:
-            row = conn.execute(
-                "SELECT event_id, event_name, admin_id, created_at FROM events WHERE event_id=?",
-                (event_id,),
-            ).fetchone()
-            if not row:
-                return None
-            return {
-                "event_id": row[0],
-                "event_name": row[1] or f"Event {row[0][:8]}",
-                "admin_id": row[2],
-                "created_at": row[3],
-            }
-
-    def get_admin_events(self, admin_id: int) -> List[Dict]:
-        with self.get_connection() as conn:
-            rows = conn.execute(
-                "SELECT event_id, event_name, admin_id, created_at FROM events WHERE admin_id=? ORDER BY created_at DESC",
-                (admin_id,),
-            ).fetchall()
-            return [
-                {
-                    "event_id": r[0],
-                    "event_name": r[1] or f"Event {r[0][:8]}",
-                    "admin_id": r[2],
-                    "created_at": r[3],
-                }
-                for r in rows
-            ]
+        return self.get_event(event_id) is not None
+
+    def get_event(self, event_id: str) -> Optional[Event]:
+        cached = self._event_cache.get(event_id)
+        if cached is not None:
+            return cached
+        generation = self._event_cache.generation
+        with self.conn() as conn:
+            row = conn.execute(SQL_GET_EVENT, (event_id,)).fetchone()
+        if not row:
+            return None
+        event = Event(*row)
+        self._event_cache.put(event_id, event, generation)
+        return event
+
+    def get_admin_events(self, admin_id: int) -> List[Event]:
+        with self.conn() as conn:
+            return [Event(*r) for r in conn.execute(SQL_ADMIN_EVENTS, (admin_id,))]
 
     def is_admin(self, event_id: str, user_id: int) -> bool:
-        with self.get_connection() as conn:
-            row = conn.execute("SELECT admin_id FROM events WHERE event_id=?", (event_id,)).fetchone()
-            return bool(row) and row[0] == user_id
+        event = self.get_event(event_id)
+        return event is not None and event.admin_id == user_id
 
-    def get_participating_events(self, telegram_id: int) -> List[Dict]:
-        with self.get_connection() as conn:
-            rows = conn.execute(
-                """
-                SELECT e.event_id, e.event_name, e.admin_id, e.created_at
-                FROM participants p
-                JOIN events e ON e.event_id = p.event_id
-                WHERE p.telegram_id = ?
-                ORDER BY e.created_at DESC
-                """,
-                (telegram_id,),
-            ).fetchall()
-            return [
-                {
-                    "event_id": r[0],
-                    "event_name": r[1] or f"Event {r[0][:8]}",
-                    "admin_id": r[2],
-                    "created_at": r[3],
-                }
-                for r in rows
-            ]
+    def get_participating_events(self, telegram_id: int) -> List[Event]:
+        with self.conn() as conn:
+            return [Event(*r) for r in conn.execute(SQL_PARTICIPATING_EVENTS, (telegram_id,))]
+
+    def count_hub(self, telegram_id: int) -> Tuple[int, int]:
+        """(events the user organizes, events the user joined), counted without loading rows."""
+        with self.conn() as conn:
+            admin_count, joined_count = conn.execute(SQL_HUB_COUNTS, (telegram_id, telegram_id)).fetchone()
+        return admin_count, joined_count
 
     # ---- Event content ----
-    def get_event_content(self, event_id: str) -> Dict:
-        with self.get_connection() as conn:
-            row = conn.execute(
-                """
-                SELECT agenda, wifi_ssid, wifi_password,
-                       organizer_name, organizer_phone, organizer_email, organizer_telegram,
-                       event_time, event_location,
-                       loc_lat, loc_lon
-                FROM event_content WHERE event_id=?
-                """,
-                (event_id,),
-            ).fetchone()
-            if not row:
-                return {}
-            return {
-                "agenda": row[0],
-                "wifi_ssid": row[1],
-                "wifi_password": row[2],
-                "organizer_name": row[3],
-                "organizer_phone": row[4],
-                "organizer_email": row[5],
-                "organizer_telegram": row[6],
-                "event_time": row[7],
-                "event_location": row[8],
-                "loc_lat": row[9],
-                "loc_lon": row[10],
-            }
+    def get_event_content(self, event_id: str) -> EventContent:
+        cached = self._content_cache.get(event_id)
+        if cached is not None:
+            return cached
+        generation = self._content_cache.generation
+        with self.conn() as conn:
+            row = conn.execute(SQL_GET_EVENT_CONTENT, (event_id,)).fetchone()
+        if not row:
+            return EMPTY_CONTENT
+        content = EventContent(*row)
+        self._content_cache.put(event_id, content, generation)
+        return content
 
     def set_agenda(self, event_id: str, agenda: str):
-        with self.get_connection() as conn:
-            conn.execute("UPDATE event_content SET agenda=? WHERE event_id=?", (agenda, event_id))
+        with self.conn() as conn:
+            conn.execute(SQL_SET_AGENDA, (agenda, event_id))
+        self._content_cache.pop(event_id)
 
     def set_wifi(self, event_id: str, ssid: str, password: str):
-        with self.get_connection() as conn:
-            conn.execute(
-                "UPDATE event_content SET wifi_ssid=?, wifi_password=? WHERE event_id=?",
-                (ssid, password, event_id),
-            )
+        with self.conn() as conn:
+            conn.execute(SQL_SET_WIFI, (ssid, password, event_id))
+        self._content_cache.pop(event_id)
 
     def set_organizer_info(self, event_id: str, name: str, phone: str, email: str, tg: str):
-        with self.get_connection() as conn:
-            conn.execute(
-                """
-                UPDATE event_content
-                SET organizer_name=?, organizer_phone=?, organizer_email=?, organizer_telegram=?
-                WHERE event_id=?
-                """,
-                (name, phone, email, tg, event_id),
-            )
+        with self.conn() as conn:
+            conn.execute(SQL_SET_ORGANIZER_INFO, (name, phone, email, tg, event_id))
+        self._content_cache.pop(event_id)
 
     def set_time(self, event_id: str, event_time_iso: Optional[str]):
-        with self.get_connection() as conn:
-            conn.execute("UPDATE event_content SET event_time=? WHERE event_id=?", (event_time_iso, event_id))
+        with self.conn() as conn:
+            conn.execute(SQL_SET_TIME, (event_time_iso, event_id))
+        self._content_cache.pop(event_id)
 
     def set_location(self, event_id: str, location: Optional[str]):
-        with self.get_connection() as conn:
-            conn.execute("UPDATE event_content SET event_location=? WHERE event_id=?", (location, event_id))
+        with self.conn() as conn:
+            conn.execute(SQL_SET_LOCATION, (location, event_id))
+        self._content_cache.pop(event_id)
 
     def set_map_pin(self, event_id: str, lat: float, lon: float):
-        with self.get_connection() as conn:
-            conn.execute(
-                "UPDATE event_content SET loc_lat=?, loc_lon=? WHERE event_id=?",
-                (lat, lon, event_id),
-            )
+        with self.conn() as conn:
+            conn.execute(SQL_SET_MAP_PIN, (lat, lon, event_id))
+        self._content_cache.pop(event_id)
 
     def clear_map_pin(self, event_id: str):
-        with self.get_connection() as conn:
-            conn.execute(
-                "UPDATE event_content SET loc_lat=NULL, loc_lon=NULL WHERE event_id=?",
-                (event_id,),
-            )
+        with self.conn() as conn:
+            conn.execute(SQL_CLEAR_MAP_PIN, (event_id,))
+        self._content_cache.pop(event_id)
 
     # ---- Participants ----
     def ensure_participant_stub(
@@ -728,299 +1181,348 @@ class Database:
         last_name: Optional[str],
     ):
         username = norm_username(username)
-        with self.get_connection() as conn:
+        with self.conn() as conn:
             conn.execute(
-                """
-                INSERT OR IGNORE INTO participants(event_id, telegram_id, username, first_name, last_name, registered_at)
-                VALUES(?,?,?,?,?,?)
-                """,
+                SQL_UPSERT_PARTICIPANT_STUB,
                 (event_id, telegram_id, username, first_name, last_name, now_ts()),
             )
-            conn.execute(
-                """
-                UPDATE participants
-                SET username=COALESCE(?, username),
-                    first_name=COALESCE(?, first_name),
-                    last_name=COALESCE(?, last_name)
-                WHERE event_id=? AND telegram_id=?
-                """,
-                (username, first_name, last_name, event_id, telegram_id),
-            )
+
+    def enter_event(
+        self,
+        event_id: str,
+        telegram_id: int,
+        username: Optional[str],
+        first_name: Optional[str],
+        last_name: Optional[str],
+    ) -> bool:
+        """
+        Record the user as a participant and make the event their current one, in one commit.
+        Returns whether the participant already has a full registration.
+        """
+        with self.transaction() as conn:
+            self.ensure_participant_stub(event_id, telegram_id, username, first_name, last_name)
+            self.set_current_event(telegram_id, event_id)
+            return _is_full_registration(conn.execute(SQL_GET_REGISTRATION, (event_id, telegram_id)).fetchone())
 
     def has_full_registration(self, event_id: str, telegram_id: int) -> bool:
-        with self.get_connection() as conn:
-            row = conn.execute(
-                """
-                SELECT full_name, phone_number, company_name
-                FROM participants WHERE event_id=? AND telegram_id=?
-                """,
-                (event_id, telegram_id),
-            ).fetchone()
-            if not row:
-                return False
-            full_name, phone, company = row
-            return bool((full_name or "").strip()) and bool((phone or "").strip()) and bool((company or "").strip())
+        with self.conn() as conn:
+            return _is_full_registration(conn.execute(SQL_GET_REGISTRATION, (event_id, telegram_id)).fetchone())
 
     def set_registration_info(self, event_id: str, telegram_id: int, full_name: str, phone: str, company: str):
-        with self.get_connection() as conn:
+        with self.conn() as conn:
             conn.execute(
-                """
-                UPDATE participants
-                SET full_name=?, phone_number=?, company_name=?
-                WHERE event_id=? AND telegram_id=?
-                """,
+                SQL_SET_REGISTRATION,
                 (full_name.strip(), norm_phone(phone), company.strip(), event_id, telegram_id),
             )
 
-    def list_members(self, event_id: str) -> List[Dict]:
-        with self.get_connection() as conn:
-            rows = conn.execute(
-                """
-                SELECT telegram_id, username, first_name, last_name, full_name, phone_number, company_name, registered_at
-                FROM participants
-                WHERE event_id=?
-                ORDER BY registered_at DESC
-                """,
-                (event_id,),
-            ).fetchall()
-            out = []
-            for r in rows:
-                out.append(
-                    {
-                        "telegram_id": r[0],
-                        "username": r[1],
-                        "first_name": r[2],
-                        "last_name": r[3],
-                        "full_name": r[4],
-                        "phone_number": r[5],
-                        "company_name": r[6],
-                        "registered_at": r[7],
-                    }
-                )
-            return out
+    def list_members(self, event_id: str) -> List[sqlite3.Row]:
+        with self.conn() as conn:
+            return conn.execute(SQL_LIST_MEMBERS, (event_id,)).fetchall()
 
     def leave_event(self, event_id: str, telegram_id: int):
-        with self.get_connection() as conn:
-            conn.execute("DELETE FROM participants WHERE event_id=? AND telegram_id=?", (event_id, telegram_id))
+        with self.conn() as conn:
+            conn.execute(SQL_LEAVE_EVENT, (event_id, telegram_id))
+            conn.execute(SQL_CLEAR_USER_CONTEXT_FOR_EVENT, (telegram_id, event_id))
 
     def get_participant_telegram_ids(self, event_id: str) -> List[int]:
-        with self.get_connection() as conn:
-            rows = conn.execute(
-                "SELECT telegram_id FROM participants WHERE event_id=? AND telegram_id IS NOT NULL",
-                (event_id,),
-            ).fetchall()
-            return [r[0] for r in rows if r and r[0] is not None]
+        with self.conn() as conn:
+            rows = conn.execute(SQL_PARTICIPANT_IDS, (event_id,)).fetchall()
+            return [r[0] for r in rows]
 
     # ---- Photos ----
-    def add_photo(self, event_id: str, file_id: str, caption: Optional[str]):
-        with self.get_connection() as conn:
-            conn.execute(
-                "INSERT INTO photos(event_id, file_id, caption, uploaded_at) VALUES(?,?,?,?)",
-                (event_id, file_id, caption, now_ts()),
-            )
-
-    def get_photos(self, event_id: str) -> List[Dict]:
-        with self.get_connection() as conn:
-            rows = conn.execute(
-                "SELECT file_id, caption FROM photos WHERE event_id=? ORDER BY uploaded_at ASC",
-                (event_id,),
-            ).fetchall()
-            return [{"file_id": r[0], "caption": r[1]} for r in rows]
+    def add_photos(self, rows: List[Tuple[str, str, Optional[str], str]]) -> int:
+        """
+        Insert (event_id, file_id, caption, uploaded_at) rows in one transaction.
+        If a row violates a constraint (e.g. its event was deleted meanwhile), the rows are
+        retried one by one and the rejected ones are logged and skipped; returns how many.
+        """
+        try:
+            with self.conn() as conn:
+                conn.executemany(SQL_INSERT_PHOTO, rows)
+            return 0
+        except sqlite3.IntegrityError:
+            pass
+        rejected = 0
+        with self.conn() as conn:
+            for row in rows:
+                try:
+                    conn.execute(SQL_INSERT_PHOTO, row)
+                except sqlite3.IntegrityError as e:
+                    rejected += 1
+                    logger.warning("Dropping photo %s for event %s: %s", row[1], row[0], e)
+        return rejected
+
+    def get_photos(self, event_id: str) -> List[sqlite3.Row]:
+        with self.conn() as conn:
+            return conn.execute(SQL_GET_PHOTOS, (event_id,)).fetchall()
 
     # ---- Anonymous questions ----
     def add_question(self, event_id: str, sender_id: int, text: str):
-        with self.get_connection() as conn:
-            conn.execute(
-                """
-                INSERT INTO anonymous_questions(event_id, sender_telegram_id, question_text, created_at, status)
-                VALUES(?,?,?,?, 'new')
-                """,
-                (event_id, sender_id, text, now_ts()),
-            )
+        with self.conn() as conn:
+            conn.execute(SQL_INSERT_QUESTION, (event_id, sender_id, text, now_ts()))
 
-    def list_questions(self, event_id: str, limit: int = 50) -> List[Dict]:
-        with self.get_connection() as conn:
-            rows = conn.execute(
-                """
-                SELECT id, question_text, created_at, status
-                FROM anonymous_questions
-                WHERE event_id=?
-                ORDER BY created_at DESC
-                LIMIT ?
-                """,
-                (event_id, limit),
-            ).fetchall()
-            return [{"id": r[0], "text": r[1], "created_at": r[2], "status": r[3]} for r in rows]
+    def list_questions(self, event_id: str, limit: int = 50) -> List[sqlite3.Row]:
+        with self.conn() as conn:
+            return conn.execute(SQL_LIST_QUESTIONS, (event_id, limit)).fetchall()
 
     # ---- Feedback ----
     def set_feedback(self, event_id: str, telegram_id: int, rating: int, comment: Optional[str] = None):
-        with self.get_connection() as conn:
-            conn.execute(
-                """
-                INSERT INTO feedback(event_id, telegram_id, rating, comment, created_at)
-                VALUES(?,?,?,?,?)
-                ON CONFLICT(event_id, telegram_id) DO UPDATE SET
-                    rating=excluded.rating,
-                    comment=COALESCE(excluded.comment, feedback.comment),
-                    created_at=excluded.created_at
-                """,
-                (event_id, telegram_id, rating, comment, now_ts()),
-            )
+        with self.conn() as conn:
+            conn.execute(SQL_UPSERT_FEEDBACK, (event_id, telegram_id, rating, comment, now_ts()))
 
     def get_feedback_summary(self, event_id: str) -> Dict:
-        with self.get_connection() as conn:
-            rows = conn.execute(
-                "SELECT rating, COUNT(*) FROM feedback WHERE event_id=? GROUP BY rating",
-                (event_id,),
-            ).fetchall()
-            up = 0
-            down = 0
-            for r, c in rows:
-                if r == 1:
-                    up = c
-                elif r == -1:
-                    down = c
-            total = up + down
-            return {"up": up, "down": down, "total": total}
-
-    def list_feedback_comments(self, event_id: str, limit: int = 50) -> List[Dict]:
-        with self.get_connection() as conn:
-            rows = conn.execute(
-                """
-                SELECT telegram_id, rating, comment, created_at
-                FROM feedback
-                WHERE event_id=? AND comment IS NOT NULL AND TRIM(comment) != ''
-                ORDER BY created_at DESC
-                LIMIT ?
-                """,
-                (event_id, limit),
-            ).fetchall()
-            return [{"telegram_id": r[0], "rating": r[1], "comment": r[2], "created_at": r[3]} for r in rows]
+        with self.conn() as conn:
+            up, down = conn.execute(SQL_FEEDBACK_SUMMARY, (event_id,)).fetchone()
+        return {"up": up, "down": down, "total": up + down}
 
-    # ---- State persistence ----
-    def set_user_state(self, telegram_id: int, state: Optional[str], payload: Optional[Dict] = None):
-        payload_json = json.dumps(payload or {}, ensure_ascii=False)
-        with self.get_connection() as conn:
-            if state is None:
-                conn.execute("DELETE FROM user_state WHERE telegram_id=?", (telegram_id,))
-            else:
-                conn.execute(
-                    """
-                    INSERT INTO user_state(telegram_id, state, payload_json, updated_at)
-                    VALUES(?,?,?,?)
-                    ON CONFLICT(telegram_id) DO UPDATE SET
-                        state=excluded.state,
-                        payload_json=excluded.payload_json,
-                        updated_at=excluded.updated_at
-                    """,
-                    (telegram_id, state, payload_json, now_ts()),
-                )
+    def list_feedback_comments(self, event_id: str, limit: int = 50) -> List[sqlite3.Row]:
+        with self.conn() as conn:
+            return conn.execute(SQL_FEEDBACK_COMMENTS, (event_id, limit)).fetchall()
 
-    def get_user_state(self, telegram_id: int) -> Tuple[Optional[str], Dict]:
-        with self.get_connection() as conn:
-            row = conn.execute(
-                "SELECT state, payload_json FROM user_state WHERE telegram_id=?",
-                (telegram_id,),
-            ).fetchone()
-            if not row:
-                return None, {}
-            st = row[0]
+    # ---- State persistence ----
+    def load_user_states(self) -> Dict[int, Tuple[str, Dict]]:
+        with self.conn() as conn:
+            rows = conn.execute(SQL_LOAD_USER_STATES).fetchall()
+        out: Dict[int, Tuple[str, Dict]] = {}
+        for tid, st, payload_json in rows:
+            if not st:
+                continue
             try:
-                payload = json.loads(row[1] or "{}")
+                payload = json.loads(payload_json or "{}")
             except Exception:
                 payload = {}
-            return st, payload
-
-    def clear_user_state(self, telegram_id: int):
-        self.set_user_state(telegram_id, None, None)
+            out[tid] = (st, payload)
+        return out
+
+    def save_user_states(self, upserts: List[Tuple[int, str, Dict]], deletes: List[int]):
+        ts = now_ts()
+        with self.conn() as conn:
+            if deletes:
+                conn.executemany(SQL_DELETE_USER_STATE, [(tid,) for tid in deletes])
+            if upserts:
+                conn.executemany(
+                    SQL_UPSERT_USER_STATE,
+                    [(tid, st, json.dumps(payload, ensure_ascii=False), ts) for tid, st, payload in upserts],
+                )
 
     def set_current_event(self, telegram_id: int, event_id: Optional[str]):
-        with self.get_connection() as conn:
+        with self.conn() as conn:
             if event_id is None:
-                conn.execute("DELETE FROM user_context WHERE telegram_id=?", (telegram_id,))
+                conn.execute(SQL_DELETE_USER_CONTEXT, (telegram_id,))
             else:
-                conn.execute(
-                    """
-                    INSERT INTO user_context(telegram_id, current_event_id, updated_at)
-                    VALUES(?,?,?)
-                    ON CONFLICT(telegram_id) DO UPDATE SET
-                        current_event_id=excluded.current_event_id,
-                        updated_at=excluded.updated_at
-                    """,
-                    (telegram_id, event_id, now_ts()),
-                )
+                conn.execute(SQL_UPSERT_USER_CONTEXT, (telegram_id, event_id, now_ts()))
 
     def get_current_event(self, telegram_id: int) -> Optional[str]:
-        with self.get_connection() as conn:
-            row = conn.execute(
-                "SELECT current_event_id FROM user_context WHERE telegram_id=?",
-                (telegram_id,),
-            ).fetchone()
+        with self.conn() as conn:
+            row = conn.execute(SQL_GET_CURRENT_EVENT, (telegram_id,)).fetchone()
             return row[0] if row and row[0] else None
 
     # ---- Alerts ----
     def add_alert(self, event_id: str, run_at_iso: str, minutes_before: int, created_by: int) -> int:
-        with self.get_connection() as conn:
+        with self.conn() as conn:
             cur = conn.cursor()
-            cur.execute(
-                """
-                INSERT INTO alerts(event_id, run_at_iso, minutes_before, created_by, status)
-                VALUES(?,?,?,?, 'scheduled')
-                """,
-                (event_id, run_at_iso, minutes_before, created_by),
-            )
+            cur.execute(SQL_INSERT_ALERT, (event_id, run_at_iso, minutes_before, created_by))
             return cur.lastrowid
 
-    def list_future_alerts(self) -> List[Dict]:
-        with self.get_connection() as conn:
-            rows = conn.execute(
-                """
-                SELECT id, event_id, run_at_iso, minutes_before, created_by, status
-                FROM alerts
-                WHERE status='scheduled'
-                """,
-            ).fetchall()
-            out = []
-            for r in rows:
-                out.append(
-                    {
-                        "id": r[0],
-                        "event_id": r[1],
-                        "run_at_iso": r[2],
-                        "minutes_before": r[3],
-                        "created_by": r[4],
-                        "status": r[5],
-                    }
-                )
-            return out
+    def list_future_alerts(self) -> List[sqlite3.Row]:
+        with self.conn() as conn:
+            return conn.execute(SQL_FUTURE_ALERTS).fetchall()
 
     def mark_alert_sent(self, alert_id: int):
-        with self.get_connection() as conn:
-            conn.execute("UPDATE alerts SET status='sent' WHERE id=?", (alert_id,))
+        with self.conn() as conn:
+            conn.execute(SQL_MARK_ALERT_SENT, (alert_id,))
+
+    def mark_alerts_sent(self, alert_ids: List[int]):
+        with self.conn() as conn:
+            conn.executemany(SQL_MARK_ALERT_SENT, [(alert_id,) for alert_id in alert_ids])
+
+
+class AsyncDatabase:
+    """
+    Awaitable view of a Database for use inside handlers:
+    `await adb.get_event(eid)` runs `db.get_event(eid)` on a worker thread.
+    """
+
+    def __init__(self, database: Database):
+        self._db = database
+
+    # Event lookups are answered straight from the row cache when possible,
+    # skipping the executor hop; misses fall through to the worker thread.
+    async def get_event(self, event_id: str) -> Optional[Event]:
+        cached = self._db._event_cache.get(event_id)
+        if cached is not None:
+            return cached
+        return await self._db._run(self._db.get_event, event_id)
+
+    async def get_event_content(self, event_id: str) -> EventContent:
+        cached = self._db._content_cache.get(event_id)
+        if cached is not None:
+            return cached
+        return await self._db._run(self._db.get_event_content, event_id)
+
+    async def event_exists(self, event_id: str) -> bool:
+        return await self.get_event(event_id) is not None
+
+    async def is_admin(self, event_id: str, user_id: int) -> bool:
+        event = await self.get_event(event_id)
+        return event is not None and event.admin_id == user_id
+
+    def __getattr__(self, name: str):
+        call = functools.partial(self._db._run, getattr(self._db, name))
+        setattr(self, name, call)
+        return call
+
+
+class UserStateStore:
+    """
+    Conversation state kept in process memory.
+    Handlers read and write it synchronously; changes are written back to the
+    user_state table in one transaction by `flush()` (periodically and on shutdown).
+    """
+
+    def __init__(self):
+        self._states: Dict[int, Tuple[str, Dict]] = {}
+        self._dirty: set = set()
+
+    async def load(self):
+        self._states = await adb.load_user_states()
+        self._dirty.clear()
+
+    def get(self, telegram_id: int) -> Tuple[Optional[str], Dict]:
+        entry = self._states.get(telegram_id)
+        if entry is None:
+            return None, {}
+        return entry[0], dict(entry[1])
+
+    def set(self, telegram_id: int, state: Optional[str], payload: Optional[Dict] = None):
+        if state is None:
+            if self._states.pop(telegram_id, None) is None:
+                return
+        else:
+            entry = (state, dict(payload or {}))
+            if self._states.get(telegram_id) == entry:
+                return
+            self._states[telegram_id] = entry
+        self._dirty.add(telegram_id)
+
+    def clear(self, telegram_id: int):
+        self.set(telegram_id, None)
+
+    async def flush(self):
+        if not self._dirty:
+            return
+        dirty, self._dirty = self._dirty, set()
+        upserts: List[Tuple[int, str, Dict]] = []
+        deletes: List[int] = []
+        for tid in dirty:
+            entry = self._states.get(tid)
+            if entry is None:
+                deletes.append(tid)
+            else:
+                upserts.append((tid, entry[0], entry[1]))
+        try:
+            await adb.save_user_states(upserts, deletes)
+        except Exception:
+            self._dirty |= dirty
+            raise
+
+
+class PhotoBuffer:
+    """
+    Collects uploaded photos for a short window and saves each burst
+    (e.g. an album, which arrives as one update per photo) in a single transaction.
+    Call `flush()` before reading photos back or deleting an event.
+    """
+
+    def __init__(self, delay: float = 0.2, retry_delay: float = 5.0, max_attempts: int = 4):
+        self.delay = delay
+        self.retry_delay = retry_delay
+        self.max_attempts = max_attempts
+        self._rows: List[Tuple[str, str, Optional[str], str]] = []
+        self._timer: Optional[asyncio.TimerHandle] = None
+        self._task: Optional[asyncio.Task] = None
+        self._failures = 0
+
+    def add(self, event_id: str, file_id: str, caption: Optional[str]):
+        self._rows.append((event_id, file_id, caption, now_ts()))
+        self._arm(self.delay)
+
+    def _arm(self, delay: float):
+        if self._timer is None:
+            self._timer = asyncio.get_running_loop().call_later(delay, self._on_timer)
+
+    def _on_timer(self):
+        self._timer = None
+        self._task = asyncio.create_task(self.flush())
+
+    async def flush(self, retry: bool = True):
+        """Save buffered photos; on failure retry with backoff (unless `retry` is False, e.g. at shutdown)."""
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        # Let a timer-driven write finish first, so callers really see every saved photo.
+        task = self._task
+        if task is not None and task is not asyncio.current_task():
+            await task
+        rows, self._rows = self._rows, []
+        if not rows:
+            return
+        try:
+            # Constraint-violating rows are dropped inside add_photos; what raises here is transient.
+            await adb.add_photos(rows)
+        except Exception as e:
+            self._failures += 1
+            if not retry or self._failures >= self.max_attempts:
+                logger.exception("Giving up on %d photos after %d failed attempts", len(rows), self._failures)
+                self._failures = 0
+                return
+            # The uploader was already told these were saved: keep them queued and retry.
+            delay = self.retry_delay * 2 ** (self._failures - 1)
+            logger.warning("Failed to save %d photos (attempt %d/%d), retrying in %ss: %s", len(rows), self._failures, self.max_attempts, delay, e)
+            self._rows[:0] = rows
+            self._arm(delay)
+        else:
+            self._failures = 0
 
 
 db = Database(DB_FILE)
+adb = AsyncDatabase(db)
+user_states = UserStateStore()
+photo_buffer = PhotoBuffer()
 
 # ----------------------------
 # Inline UI builders
 # ----------------------------
+@ui_cached
+def cb_button(key: str, callback_data: str) -> InlineKeyboardButton:
+    return InlineKeyboardButton(btn(key), callback_data=callback_data)
+
+
+@ui_cached
+def kb_single(key: str, callback_data: str) -> InlineKeyboardMarkup:
+    return InlineKeyboardMarkup([[cb_button(key, callback_data)]])
+
+
 def kb_cancel(back_cb: str) -> InlineKeyboardMarkup:
-    return InlineKeyboardMarkup([[InlineKeyboardButton(btn("cancel"), callback_data=back_cb)]])
+    return kb_single("cancel", back_cb)
+
 
+def kb_back(back_cb: str) -> InlineKeyboardMarkup:
+    return kb_single("back", back_cb)
 
-def kb_hub(user_id: int) -> InlineKeyboardMarkup:
-    admin_events = db.get_admin_events(user_id)
-    joined = db.get_participating_events(user_id)
+
+async def kb_hub(user_id: int) -> InlineKeyboardMarkup:
+    admin_count, joined_count = await adb.count_hub(user_id)
     rows = [
-        [InlineKeyboardButton(btn("hub_admin", n=len(admin_events)), callback_data="hub:admin")],
-        [InlineKeyboardButton(btn("hub_joined", n=len(joined)), callback_data="hub:joined")],
+        [InlineKeyboardButton(btn("hub_admin", n=admin_count), callback_data="hub:admin")],
+        [InlineKeyboardButton(btn("hub_joined", n=joined_count), callback_data="hub:joined")],
         [InlineKeyboardButton(btn("hub_create"), callback_data="event:create")],
     ]
     return InlineKeyboardMarkup(rows)
 
 
-def kb_hub_list_admin(user_id: int, bot_username: str) -> InlineKeyboardMarkup:
-    events = db.get_admin_events(user_id)
+async def kb_hub_list_admin(user_id: int) -> InlineKeyboardMarkup:
+    events = await adb.get_admin_events(user_id)
     rows: List[List[InlineKeyboardButton]] = []
 
     if not events:
@@ -1029,8 +1531,8 @@ def kb_hub_list_admin(user_id: int, bot_username: str) -> InlineKeyboardMarkup:
         return InlineKeyboardMarkup(rows)
 
     for e in events:
-        eid = e["event_id"]
-        name = e["event_name"]
+        eid = e.event_id
+        name = e.title
         rows.append(
             [InlineKeyboardButton(btn("event_item_admin", name=name), callback_data=f"event:open:{eid}:hub_admin")]
         )
@@ -1040,10 +1542,8 @@ def kb_hub_list_admin(user_id: int, bot_username: str) -> InlineKeyboardMarkup:
     return InlineKeyboardMarkup(rows)
 
 
-
-
-def kb_hub_list_joined(user_id: int, bot_username: str) -> InlineKeyboardMarkup:
-    events = db.get_participating_events(user_id)
+async def kb_hub_list_joined(user_id: int) -> InlineKeyboardMarkup:
+    events = await adb.get_participating_events(user_id)
     rows: List[List[InlineKeyboardButton]] = []
 
     if not events:
@@ -1051,8 +1551,8 @@ def kb_hub_list_joined(user_id: int, bot_username: str) -> InlineKeyboardMarkup:
         return InlineKeyboardMarkup(rows)
 
     for e in events:
-        eid = e["event_id"]
-        name = e["event_name"]
+        eid = e.event_id
+        name = e.title
         rows.append(
             [InlineKeyboardButton(btn("event_item_joined", name=name), callback_data=f"event:open:{eid}:hub_joined")]
         )
@@ -1062,8 +1562,7 @@ def kb_hub_list_joined(user_id: int, bot_username: str) -> InlineKeyboardMarkup:
     return InlineKeyboardMarkup(rows)
 
 
-
-
+@ui_cached
 def kb_confirm(action_yes: str, action_no: str) -> InlineKeyboardMarkup:
     return InlineKeyboardMarkup(
         [[InlineKeyboardButton(btn("yes"), callback_data=action_yes), InlineKeyboardButton(btn("no"), callback_data=action_no)]]
@@ -1071,6 +1570,11 @@ def kb_confirm(action_yes: str, action_no: str) -> InlineKeyboardMarkup:
 
 
 def kb_admin_manage(event_id: str, user_id: int) -> InlineKeyboardMarkup:
+    return _kb_admin_manage()
+
+
+@ui_cached
+def _kb_admin_manage() -> InlineKeyboardMarkup:
     rows = [
         [
             InlineKeyboardButton(btn("agenda"), callback_data="admin:agenda"),
@@ -1092,6 +1596,11 @@ def kb_admin_manage(event_id: str, user_id: int) -> InlineKeyboardMarkup:
 
 
 def kb_admin_view(event_id: str, user_id: int) -> InlineKeyboardMarkup:
+    return _kb_admin_view()
+
+
+@ui_cached
+def _kb_admin_view() -> InlineKeyboardMarkup:
     rows = [
         [InlineKeyboardButton(btn("members"), callback_data="admin:members")],
         [InlineKeyboardButton(btn("anon_questions"), callback_data="admin:questions")],
@@ -1101,16 +1610,21 @@ def kb_admin_view(event_id: str, user_id: int) -> InlineKeyboardMarkup:
     return InlineKeyboardMarkup(rows)
 
 
-def kb_event_menu(event_id: str, user_id: int, src: str, share_url: Optional[str] = None) -> InlineKeyboardMarkup:
-    is_admin = db.is_admin(event_id, user_id)
+async def kb_event_menu(event_id: str, user_id: int, src: str, share_url: Optional[str] = None) -> InlineKeyboardMarkup:
+    return _kb_event_menu(await adb.is_admin(event_id, user_id), src, share_url)
+
+
+# The layout depends only on role, origin and share link, so each variant is built once.
+@ui_cached
+def _kb_event_menu(is_admin: bool, src: str, share_url: Optional[str]) -> InlineKeyboardMarkup:
     rows: List[List[InlineKeyboardButton]] = []
 
     if is_admin:
         rows += [
-            [InlineKeyboardButton(btn("manage"), callback_data="admin:manage"),
-             InlineKeyboardButton(btn("view"), callback_data="admin:view")],
-            [InlineKeyboardButton(btn("push"), callback_data="admin:notify"),
-             InlineKeyboardButton(btn("alert"), callback_data="admin:alert")],
+            [cb_button("manage", "admin:manage"),
+             cb_button("view", "admin:view")],
+            [cb_button("push", "admin:notify"),
+             cb_button("alert", "admin:alert")],
         ]
 
         # ✅ one-tap share (no intermediate screen)
@@ -1118,17 +1632,17 @@ def kb_event_menu(event_id: str, user_id: int, src: str, share_url: Optional[str
             rows.append([InlineKeyboardButton(btn("share"), url=share_url)])
         else:
             # fallback (should rarely happen)
-            rows.append([InlineKeyboardButton(btn("invite_link"), callback_data="admin:invite")])
+            rows.append([cb_button("invite_link", "admin:invite")])
 
-        rows.append([InlineKeyboardButton(btn("delete_event"), callback_data="admin:delete")])
+        rows.append([cb_button("delete_event", "admin:delete")])
 
     else:
         rows += [
-            [InlineKeyboardButton(btn("p_info"), callback_data="p:info"),
-             InlineKeyboardButton(btn("p_share"), url=share_url) if share_url else InlineKeyboardButton(btn("p_share"), callback_data="p:share")],
-            [InlineKeyboardButton(btn("p_ask"), callback_data="p:ask"),
-             InlineKeyboardButton(btn("p_feedback"), callback_data="p:feedback")],
-            [InlineKeyboardButton(btn("p_leave"), callback_data="p:leave")],
+            [cb_button("p_info", "p:info"),
+             InlineKeyboardButton(btn("p_share"), url=share_url) if share_url else cb_button("p_share", "p:share")],
+            [cb_button("p_ask", "p:ask"),
+             cb_button("p_feedback", "p:feedback")],
+            [cb_button("p_leave", "p:leave")],
         ]
 
     if src == "hub_admin":
@@ -1138,11 +1652,12 @@ def kb_event_menu(event_id: str, user_id: int, src: str, share_url: Optional[str
     else:
         back_cb = "hub:none"
 
-    rows.append([InlineKeyboardButton(btn("back"), callback_data=back_cb)])
+    rows.append([cb_button("back", back_cb)])
     return InlineKeyboardMarkup(rows)
 
 
 
+@ui_cached
 def kb_admin_field_menu(field: str, back: str) -> InlineKeyboardMarkup:
     return InlineKeyboardMarkup(
         [
@@ -1153,6 +1668,43 @@ def kb_admin_field_menu(field: str, back: str) -> InlineKeyboardMarkup:
     )
 
 
+@ui_cached
+def kb_alert_menu() -> InlineKeyboardMarkup:
+    rows = [
+        [
+            InlineKeyboardButton(btn("alert_before", m=15), callback_data="admin:alert_set:15"),
+            InlineKeyboardButton(btn("alert_before", m=30), callback_data="admin:alert_set:30"),
+        ],
+        [InlineKeyboardButton(btn("alert_before", m=60), callback_data="admin:alert_set:60")],
+        [cb_button("back", "admin:back_to_menu")],
+    ]
+    return InlineKeyboardMarkup(rows)
+
+
+@ui_cached
+def kb_photos_menu() -> InlineKeyboardMarkup:
+    rows = [
+        [cb_button("photos_view", "admin:photos_view")],
+        [cb_button("photos_upload", "admin:photos_upload")],
+        [cb_button("back", "admin:manage")],
+    ]
+    return InlineKeyboardMarkup(rows)
+
+
+@ui_cached
+def kb_rating() -> InlineKeyboardMarkup:
+    rows = [
+        [cb_button("positive", "p:rate:1"), cb_button("negative", "p:rate:-1")],
+        [cb_button("back", "p:back_to_menu")],
+    ]
+    return InlineKeyboardMarkup(rows)
+
+
+@ui_cached
+def kb_feedback_comment() -> InlineKeyboardMarkup:
+    return InlineKeyboardMarkup([[cb_button("skip", "p:feedback_skip")], [cb_button("back", "p:back_to_menu")]])
+
+
 # ----------------------------
 # Bot username & invite link
 # ----------------------------
@@ -1167,56 +1719,76 @@ def get_bot_username(context: ContextTypes.DEFAULT_TYPE) -> str:
     return context.application.bot_data.get("bot_username") or (context.bot.username or "")
 
 
-def invite_link_for(context: ContextTypes.DEFAULT_TYPE, event_id: str) -> str:
-    bot_username = get_bot_username(context)
-    return f"https://t.me/{bot_username}?start={event_id}"
+def share_url_for(context: ContextTypes.DEFAULT_TYPE, event_id: str) -> str:
+    return _share_url(get_bot_username(context), event_id)
+
+
+# Keyed by bot username too, so a late get_me() result never serves a stale link.
+@functools.lru_cache(maxsize=1024)
+def _share_url(bot_username: str, event_id: str) -> str:
+    link = f"https://t.me/{bot_username}?start={event_id}"
+    return f"https://t.me/share/url?url={urllib.parse.quote_plus(link, safe='')}&text="
 
 
 # ----------------------------
 # Current event context
 # ----------------------------
-def get_current_event_id(user_id: int) -> Optional[str]:
-    return db.get_current_event(user_id)
+async def get_current_event_id(user_id: int) -> Optional[str]:
+    return await adb.get_current_event(user_id)
 
 
-def set_current_event_id(user_id: int, event_id: Optional[str]):
-    db.set_current_event(user_id, event_id)
+async def set_current_event_id(user_id: int, event_id: Optional[str]):
+    await adb.set_current_event(user_id, event_id)
 
 
 # ----------------------------
 # Rendering event info (participant)
 # ----------------------------
-def build_event_info_text(event_id: str) -> str:
-    ev = db.get_event(event_id)
-    content = db.get_event_content(event_id)
+async def build_event_info_text(event_id: str) -> str:
+    ev = await adb.get_event(event_id)
+    content = await adb.get_event_content(event_id)
     if not ev:
         return txt("event_not_found")
+    return render_event_info(ev, content)
+
+
+# Keyed by the immutable row tuples: any edit produces a new key, so no explicit invalidation.
+@functools.lru_cache(maxsize=256)
+def render_org(content: EventContent) -> str:
+    return (
+        f"Name: <b>{html_escape(content.organizer_name or 'N/A')}</b>\n"
+        f"Phone: <b>{html_escape(content.organizer_phone or 'N/A')}</b>\n"
+        f"Email: <b>{html_escape(content.organizer_email or 'N/A')}</b>\n"
+        f"Telegram: <b>{html_escape(content.organizer_telegram or 'N/A')}</b>\n"
+    )
 
-    title = html_escape(ev["event_name"])
-    tm = html_escape(display_event_time(content.get("event_time")))
-    loc = html_escape(content.get("event_location") or "Not set")
 
-    lat = content.get("loc_lat")
-    lon = content.get("loc_lon")
+@functools.lru_cache(maxsize=256)
+def render_wifi(content: EventContent) -> Optional[str]:
+    ssid = content.wifi_ssid
+    pwd = content.wifi_password
+    if not (ssid and pwd):
+        return None
+    return f"SSID: <b>{html_escape(ssid)}</b>\nPassword: <b>{html_escape(pwd)}</b>"
+
+
+@functools.lru_cache(maxsize=256)
+def render_event_info(ev: Event, content: EventContent) -> str:
+    title = ev.title_html
+    tm = html_escape(display_event_time(content.event_time))
+    loc = html_escape(content.event_location or "Not set")
+
+    lat = content.loc_lat
+    lon = content.loc_lon
     map_line = "Not set"
     if lat is not None and lon is not None:
         map_line = f"<a href=\"https://maps.google.com/?q={lat},{lon}\">Open map pin</a>"
 
-    agenda = content.get("agenda") or ""
+    agenda = content.agenda or ""
     agenda_disp = html_escape(agenda) if agenda.strip() else "Not available yet."
 
-    org = (
-        f"Name: <b>{html_escape(content.get('organizer_name') or 'N/A')}</b>\n"
-        f"Phone: <b>{html_escape(content.get('organizer_phone') or 'N/A')}</b>\n"
-        f"Email: <b>{html_escape(content.get('organizer_email') or 'N/A')}</b>\n"
-        f"Telegram: <b>{html_escape(content.get('organizer_telegram') or 'N/A')}</b>\n"
-    )
-
-    ssid = content.get("wifi_ssid")
-    pwd = content.get("wifi_password")
-    wifi = "Not available yet."
-    if ssid and pwd:
-        wifi = f"SSID: <b>{html_escape(ssid)}</b>\nPassword: <b>{html_escape(pwd)}</b>"
+    org = render_org(content)
+    wifi = render_wifi(content) or "Not available yet."
 
     txt_out = (
         f"ℹ️ <b>{title}</b>\n\n"
@@ -1230,10 +1802,23 @@ def build_event_info_text(event_id: str) -> str:
     return txt_out
 
 
+def _fmt_member(i: int, m: sqlite3.Row) -> str:
+    name = (m["full_name"] or "").strip() or " ".join(x for x in (m["first_name"], m["last_name"]) if x).strip()
+    uname = m["username"]
+    fields = (f"@{uname}" if uname else None, name, m["company_name"], m["phone_number"])
+    ident = " • ".join(html_escape(x) for x in fields if x)
+    return f"{i}. {ident}" if ident else f"{i}. ID:{m['telegram_id']}"
+
+
 async def send_event_info_with_photos(update: Update, context: ContextTypes.DEFAULT_TYPE, event_id: str):
     chat_id = update.effective_chat.id
-    photos = db.get_photos(event_id)
-    info = build_event_info_text(event_id)
+
+    async def load_photos() -> List[sqlite3.Row]:
+        await photo_buffer.flush()
+        return await adb.get_photos(event_id)
+
+    # The photo read and the info text are independent, so fetch them concurrently.
+    photos, info = await asyncio.gather(load_photos(), build_event_info_text(event_id))
     caption = clamp_caption(info)
 
     if not photos:
@@ -1241,28 +1826,24 @@ async def send_event_info_with_photos(update: Update, context: ContextTypes.DEFA
             update,
             context,
             caption,
-            reply_markup=InlineKeyboardMarkup([[InlineKeyboardButton(btn("back"), callback_data="p:back_to_menu")]]),
+            reply_markup=kb_back("p:back_to_menu"),
             parse_mode=ParseMode.HTML,
         )
         return
 
-    first = True
-    for i in range(0, len(photos), 10):
-        group = photos[i : i + 10]
-        media = []
-        for idx, p in enumerate(group):
-            if first and idx == 0:
-                media.append(InputMediaPhoto(media=p["file_id"], caption=caption, parse_mode=ParseMode.HTML))
-            else:
-                media.append(InputMediaPhoto(media=p["file_id"]))
-        await context.bot.send_media_group(chat_id=chat_id, media=media)
-        first = False
+    media = [InputMediaPhoto(media=photos[0]["file_id"], caption=caption, parse_mode=ParseMode.HTML)]
+    media += [InputMediaPhoto(media=p["file_id"]) for p in photos[1:]]
+    groups = [media[i : i + 10] for i in range(0, len(media), 10)]
+
+    # Albums go out one at a time: Telegram does not order concurrent sends to one chat.
+    for group in groups:
+        await context.bot.send_media_group(chat_id=chat_id, media=group)
 
     await safe_edit_or_send(
         update,
         context,
         txt("sent_event_info"),
-        reply_markup=InlineKeyboardMarkup([[InlineKeyboardButton(btn("back"), callback_data="p:back_to_menu")]]),
+        reply_markup=kb_back("p:back_to_menu"),
         parse_mode=ParseMode.HTML,
     )
 
@@ -1281,15 +1862,14 @@ async def cmd_start(update: Update, context: ContextTypes.DEFAULT_TYPE):
 
     if context.args:
         event_id = context.args[0].strip()
-        if not db.event_exists(event_id):
+        if not await adb.event_exists(event_id):
             await update.message.reply_text(txt("invalid_event_link"), parse_mode=ParseMode.HTML)
             return
 
-        db.ensure_participant_stub(event_id, user_id, user.username, user.first_name, user.last_name)
-        set_current_event_id(user_id, event_id)
+        registered = await adb.enter_event(event_id, user_id, user.username, user.first_name, user.last_name)
 
-        if (not db.is_admin(event_id, user_id)) and (not db.has_full_registration(event_id, user_id)):
-            db.set_user_state(user_id, "reg_full_name", {"event_id": event_id, "src": "hub_joined"})
+        if (not registered) and (not await adb.is_admin(event_id, user_id)):
+            user_states.set(user_id, "reg_full_name", {"event_id": event_id, "src": "hub_joined"})
             await update.message.reply_text(
                 txt("reg_full_name_prompt"),
                 parse_mode=ParseMode.HTML,
@@ -1300,7 +1880,7 @@ async def cmd_start(update: Update, context: ContextTypes.DEFAULT_TYPE):
         await show_event_menu(update, context, event_id=event_id, src="hub_joined")
         return
 
-    db.clear_user_state(user_id)
+    user_states.clear(user_id)
     await update.message.reply_text(txt("welcome"), parse_mode=ParseMode.HTML, reply_markup=ReplyKeyboardRemove())
 
 
@@ -1309,12 +1889,12 @@ async def cmd_my_events(update: Update, context: ContextTypes.DEFAULT_TYPE):
     user = update.effective_user
     if not user or not update.message:
         return
-    db.clear_user_state(user.id)
+    user_states.clear(user.id)
 
     await update.message.reply_text(
         txt("my_events_title"),
         parse_mode=ParseMode.HTML,
-        reply_markup=kb_hub(user.id),
+        reply_markup=await kb_hub(user.id),
         disable_web_page_preview=True,
     )
 
@@ -1330,7 +1910,7 @@ async def cmd_cancel(update: Update, context: ContextTypes.DEFAULT_TYPE):
     user = update.effective_user
     if not user or not update.message:
         return
-    db.clear_user_state(user.id)
+    user_states.clear(user.id)
     await update.message.reply_text(txt("cancelled"), parse_mode=ParseMode.HTML, reply_markup=ReplyKeyboardRemove())
 
 
@@ -1341,25 +1921,24 @@ async def show_event_menu(update: Update, context: ContextTypes.DEFAULT_TYPE, ev
     user = update.effective_user
     if not user:
         return
-    event = db.get_event(event_id)
+    event = await adb.get_event(event_id)
     if not event:
         await safe_edit_or_send(update, context, txt("event_not_found"))
         return
 
-    set_current_event_id(user.id, event_id)
+    await set_current_event_id(user.id, event_id)
 
-    is_admin = db.is_admin(event_id, user.id)
+    is_admin = await adb.is_admin(event_id, user.id)
     role = "Organizer" if is_admin else "Participant"
-    title = html_escape(event["event_name"])
+    title = event.title_html
 
-    link = invite_link_for(context, event_id)
-    share_url = "https://t.me/share/url?" + urllib.parse.urlencode({"url": link, "text": ""})
+    share_url = share_url_for(context, event_id)
 
     await safe_edit_or_send(
         update,
         context,
         txt("entered_event", title=title, role=role),
-        reply_markup=kb_event_menu(event_id, user.id, src, share_url=share_url),
+        reply_markup=await kb_event_menu(event_id, user.id, src, share_url=share_url),
         parse_mode=ParseMode.HTML,
     )
 
@@ -1376,116 +1955,115 @@ async def on_callback(update: Update, context: ContextTypes.DEFAULT_TYPE):
     user = q.from_user
     user_id = user.id
     data = q.data or ""
-    bot_username = get_bot_username(context)
 
-    if data == "hub:none":
-        await safe_edit_or_send(update, context, txt("my_events_title"), reply_markup=kb_hub(user_id))
-        return
-
-    if data == "hub:admin":
-        db.clear_user_state(user_id)
-        await safe_edit_or_send(update, context, txt("events_you_organize"), reply_markup=kb_hub_list_admin(user_id, bot_username))
-        return
+    # Route on the first segment so each callback only tests the branches of its own group.
+    parts = data.split(":")
+    root = parts[0]
+    action = parts[1] if len(parts) > 1 else ""
 
-    if data == "hub:joined":
-        db.clear_user_state(user_id)
-        await safe_edit_or_send(update, context, txt("events_you_joined"), reply_markup=kb_hub_list_joined(user_id, bot_username))
-        return
+    if root == "hub":
+        if data == "hub:none":
+            await safe_edit_or_send(update, context, txt("my_events_title"), reply_markup=await kb_hub(user_id))
+            return
 
-    if data == "event:create":
-        db.set_user_state(user_id, "create_event_name", {"src": "hub:none"})
-        await safe_edit_or_send(update, context, txt("create_event_prompt"))
-        return
+        if data == "hub:admin":
+            user_states.clear(user_id)
+            await safe_edit_or_send(update, context, txt("events_you_organize"), reply_markup=await kb_hub_list_admin(user_id))
+            return
 
-    if data.startswith("event:open:"):
-        parts = data.split(":")
-        if len(parts) < 4:
+        if data == "hub:joined":
+            user_states.clear(user_id)
+            await safe_edit_or_send(update, context, txt("events_you_joined"), reply_markup=await kb_hub_list_joined(user_id))
             return
-        event_id = parts[2]
-        src = parts[3]
-        if not db.event_exists(event_id):
-            await safe_edit_or_send(update, context, txt("event_not_found"))
+
+    if root == "event":
+        if data == "event:create":
+            user_states.set(user_id, "create_event_name", {"src": "hub:none"})
+            await safe_edit_or_send(update, context, txt("create_event_prompt"))
             return
 
-        db.ensure_participant_stub(event_id, user_id, user.username, user.first_name, user.last_name)
-        set_current_event_id(user_id, event_id)
+        if action == "open" and len(parts) > 2:
+            if len(parts) < 4:
+                return
+            event_id = parts[2]
+            src = parts[3]
+            if not await adb.event_exists(event_id):
+                await safe_edit_or_send(update, context, txt("event_not_found"))
+                return
 
-        if (not db.is_admin(event_id, user_id)) and (not db.has_full_registration(event_id, user_id)):
-            db.set_user_state(user_id, "reg_full_name", {"event_id": event_id, "src": src})
-            await safe_edit_or_send(update, context, txt("reg_full_name_prompt"))
-            return
+            registered = await adb.enter_event(event_id, user_id, user.username, user.first_name, user.last_name)
 
-        await show_event_menu(update, context, event_id, src)
-        return
+            if (not registered) and (not await adb.is_admin(event_id, user_id)):
+                user_states.set(user_id, "reg_full_name", {"event_id": event_id, "src": src})
+                await safe_edit_or_send(update, context, txt("reg_full_name_prompt"))
+                return
 
-    if data.startswith("event:invite:"):
-        _, _, eid, back = data.split(":")
-        if not db.is_admin(eid, user_id):
-            await safe_edit_or_send(update, context, "❌ Only the organizer can view invite here.")
+            await show_event_menu(update, context, event_id, src)
             return
-        ev = db.get_event(eid)
-        title = html_escape(ev["event_name"]) if ev else html_escape(eid)
-        link = invite_link_for(context, eid)
-        share = "https://t.me/share/url?" + urllib.parse.urlencode({"url": link, "text": ""})
-
-        rows = [
-            [InlineKeyboardButton("📤 Share", url=share)],
-            [InlineKeyboardButton(btn("back"), callback_data="hub:admin")],
-        ]
-        await safe_edit_or_send(update, context, txt("invite_title", title=title), reply_markup=InlineKeyboardMarkup(rows))
-        return
 
+        if action == "invite" and len(parts) > 2:
+            _, _, eid, back = parts
+            if not await adb.is_admin(eid, user_id):
+                await safe_edit_or_send(update, context, "❌ Only the organizer can view invite here.")
+                return
+            ev = await adb.get_event(eid)
+            title = ev.title_html if ev else html_escape(eid)
+            share = share_url_for(context, eid)
+
+            rows = [
+                [InlineKeyboardButton("📤 Share", url=share)],
+                [InlineKeyboardButton(btn("back"), callback_data="hub:admin")],
+            ]
+            await safe_edit_or_send(update, context, txt("invite_title", title=title), reply_markup=InlineKeyboardMarkup(rows))
+            return
 
-    if data.startswith("event:del_confirm:"):
-        _, _, eid, back = data.split(":")
-        if not db.is_admin(eid, user_id):
-            await safe_edit_or_send(update, context, txt("not_allowed"))
+        if action == "del_confirm" and len(parts) > 2:
+            _, _, eid, back = parts
+            if not await adb.is_admin(eid, user_id):
+                await safe_edit_or_send(update, context, txt("not_allowed"))
+                return
+            await safe_edit_or_send(update, context, txt("delete_confirm"), reply_markup=kb_confirm(f"event:delete:{eid}:{back}", "hub:admin"))
             return
-        await safe_edit_or_send(update, context, txt("delete_confirm"), reply_markup=kb_confirm(f"event:delete:{eid}:{back}", "hub:admin"))
-        return
 
-    if data.startswith("event:delete:"):
-        _, _, eid, back = data.split(":")
-        if not db.is_admin(eid, user_id):
-            await safe_edit_or_send(update, context, txt("not_allowed"))
+        if action == "delete" and len(parts) > 2:
+            _, _, eid, back = parts
+            if not await adb.is_admin(eid, user_id):
+                await safe_edit_or_send(update, context, txt("not_allowed"))
+                return
+            await photo_buffer.flush()
+            await adb.delete_event(eid)
+            await safe_edit_or_send(update, context, txt("event_deleted"), reply_markup=await kb_hub(user_id))
             return
-        db.delete_event(eid)
-        if db.get_current_event(user_id) == eid:
-            set_current_event_id(user_id, None)
-        await safe_edit_or_send(update, context, txt("event_deleted"), reply_markup=kb_hub(user_id))
-        return
 
-    if data.startswith("event:leave_confirm:"):
-        _, _, eid, back = data.split(":")
-        if db.is_admin(eid, user_id):
-            await safe_edit_or_send(update, context, txt("organizer_cant_leave"))
+        if action == "leave_confirm" and len(parts) > 2:
+            _, _, eid, back = parts
+            if await adb.is_admin(eid, user_id):
+                await safe_edit_or_send(update, context, txt("organizer_cant_leave"))
+                return
+            await safe_edit_or_send(update, context, txt("leave_confirm"), reply_markup=kb_confirm(f"event:leave:{eid}:{back}", "hub:joined"))
             return
-        await safe_edit_or_send(update, context, txt("leave_confirm"), reply_markup=kb_confirm(f"event:leave:{eid}:{back}", "hub:joined"))
-        return
 
-    if data.startswith("event:leave:"):
-        _, _, eid, back = data.split(":")
-        if db.is_admin(eid, user_id):
-            await safe_edit_or_send(update, context, txt("organizer_cant_leave"))
+        if action == "leave" and len(parts) > 2:
+            _, _, eid, back = parts
+            if await adb.is_admin(eid, user_id):
+                await safe_edit_or_send(update, context, txt("organizer_cant_leave"))
+                return
+            await adb.leave_event(eid, user_id)
+            await safe_edit_or_send(update, context, txt("left_event"), reply_markup=await kb_hub(user_id))
             return
-        db.leave_event(eid, user_id)
-        if db.get_current_event(user_id) == eid:
-            set_current_event_id(user_id, None)
-        await safe_edit_or_send(update, context, txt("left_event"), reply_markup=kb_hub(user_id))
-        return
 
-    current_event_id = db.get_current_event(user_id)
-    if not current_event_id or not db.event_exists(current_event_id):
+    current_event_id = await adb.get_current_event(user_id)
+    if not current_event_id or not await adb.event_exists(current_event_id):
         await safe_edit_or_send(update, context, txt("choose_event_first"))
         return
 
-    is_admin = db.is_admin(current_event_id, user_id)
+    is_admin = await adb.is_admin(current_event_id, user_id)
 
-    if is_admin and data.startswith("admin:"):
+    if is_admin and root == "admin":
         await handle_admin_action(update, context, current_event_id, data)
         return
 
-    if (not is_admin) and data.startswith("p:"):
+    if (not is_admin) and root == "p":
         await handle_participant_action(update, context, current_event_id, data)
         return
 
@@ -1495,12 +2073,26 @@ async def on_callback(update: Update, context: ContextTypes.DEFAULT_TYPE):
 # ----------------------------
 # Admin actions
 # ----------------------------
+# "admin:<field>" opens that field's view/update submenu.
+_ADMIN_FIELD_MENUS = {f"admin:{f}": f for f in ("agenda", "wifi", "org", "time", "location", "map_pin")}
+
+# "admin:<field>_edit" -> (field, on_text state that collects the new value).
+_ADMIN_FIELD_EDITS = {
+    "admin:agenda_edit": ("agenda", "admin_edit_agenda"),
+    "admin:wifi_edit": ("wifi", "admin_set_wifi"),
+    "admin:org_edit": ("org", "admin_set_org"),
+    "admin:time_edit": ("time", "admin_set_time"),
+    "admin:location_edit": ("location", "admin_set_location"),
+    "admin:map_pin_edit": ("map_pin", "admin_set_map_pin"),
+}
+
+
 async def handle_admin_action(update: Update, context: ContextTypes.DEFAULT_TYPE, event_id: str, data: str):
     user = update.effective_user
     user_id = user.id
-    event = db.get_event(event_id)
-    content = db.get_event_content(event_id)
-    title = html_escape(event["event_name"])
+    event = await adb.get_event(event_id)
+    content = await adb.get_event_content(event_id)
+    title = event.title_html
 
     if data == "admin:manage":
         await safe_edit_or_send(update, context, txt("manage_title", title=title), reply_markup=kb_admin_manage(event_id, user_id))
@@ -1509,67 +2101,57 @@ async def handle_admin_action(update: Update, context: ContextTypes.DEFAULT_TYPE
         await safe_edit_or_send(update, context, txt("view_title", title=title), reply_markup=kb_admin_view(event_id, user_id))
         return
 
-    if data == "admin:agenda":
-        await safe_edit_or_send(update, context, txt("agenda_title", title=title), reply_markup=kb_admin_field_menu("agenda", "admin:manage"))
-        return
-    if data == "admin:wifi":
-        await safe_edit_or_send(update, context, txt("wifi_title", title=title), reply_markup=kb_admin_field_menu("wifi", "admin:manage"))
-        return
-    if data == "admin:org":
-        await safe_edit_or_send(update, context, txt("org_title", title=title), reply_markup=kb_admin_field_menu("org", "admin:manage"))
-        return
-    if data == "admin:time":
-        await safe_edit_or_send(update, context, txt("time_title", title=title), reply_markup=kb_admin_field_menu("time", "admin:manage"))
-        return
-    if data == "admin:location":
-        await safe_edit_or_send(update, context, txt("location_title", title=title), reply_markup=kb_admin_field_menu("location", "admin:manage"))
-        return
-
-    if data == "admin:map_pin":
+    field = _ADMIN_FIELD_MENUS.get(data)
+    if field:
         await safe_edit_or_send(
             update,
             context,
-            txt("map_pin_title", title=title),
-            reply_markup=kb_admin_field_menu("map_pin", "admin:manage"),
+            txt(f"{field}_title", title=title),
+            reply_markup=kb_admin_field_menu(field, "admin:manage"),
         )
         return
 
+    edit = _ADMIN_FIELD_EDITS.get(data)
+    if edit:
+        field, state = edit
+        user_states.set(user_id, state, {"event_id": event_id})
+        if field == "time":
+            prompt = txt("time_set_prompt", title=title, current=html_escape(display_event_time(content.event_time)))
+        elif field == "location":
+            prompt = txt("location_set_prompt", title=title, current=html_escape(content.event_location or "Not set"))
+        else:
+            prompt = txt(f"{field}_set_prompt", title=title)
+        await safe_edit_or_send(update, context, prompt, reply_markup=kb_cancel(f"admin:{field}"))
+        return
+
     if data == "admin:agenda_view":
-        agenda = content.get("agenda") or ""
+        agenda = content.agenda or ""
         value = html_escape(agenda) if agenda.strip() else "Not set"
         await safe_edit_or_send(update, context, txt("current_agenda", title=title, value=value), reply_markup=kb_admin_field_menu("agenda", "admin:manage"))
         return
 
     if data == "admin:wifi_view":
-        ssid = content.get("wifi_ssid")
-        pwd = content.get("wifi_password")
-        value = f"SSID: <b>{html_escape(ssid)}</b>\nPassword: <b>{html_escape(pwd)}</b>" if (ssid and pwd) else "Not set"
+        value = render_wifi(content) or "Not set"
         await safe_edit_or_send(update, context, txt("current_wifi", title=title, value=value), reply_markup=kb_admin_field_menu("wifi", "admin:manage"))
         return
 
     if data == "admin:org_view":
-        value = (
-            f"Name: <b>{html_escape(content.get('organizer_name') or 'N/A')}</b>\n"
-            f"Phone: <b>{html_escape(content.get('organizer_phone') or 'N/A')}</b>\n"
-            f"Email: <b>{html_escape(content.get('organizer_email') or 'N/A')}</b>\n"
-            f"Telegram: <b>{html_escape(content.get('organizer_telegram') or 'N/A')}</b>\n"
-        )
-        await safe_edit_or_send(update, context, txt("current_org", title=title, value=value), reply_markup=kb_admin_field_menu("org", "admin:manage"))
+        await safe_edit_or_send(update, context, txt("current_org", title=title, value=render_org(content)), reply_markup=kb_admin_field_menu("org", "admin:manage"))
         return
 
     if data == "admin:time_view":
-        current = display_event_time(content.get("event_time"))
+        current = display_event_time(content.event_time)
         await safe_edit_or_send(update, context, txt("current_time", title=title, value=html_escape(current)), reply_markup=kb_admin_field_menu("time", "admin:manage"))
         return
 
     if data == "admin:location_view":
-        loc = content.get("event_location") or "Not set"
+        loc = content.event_location or "Not set"
         await safe_edit_or_send(update, context, txt("current_location", title=title, value=html_escape(loc)), reply_markup=kb_admin_field_menu("location", "admin:manage"))
         return
 
     if data == "admin:map_pin_view":
-        lat = content.get("loc_lat")
-        lon = content.get("loc_lon")
+        lat = content.loc_lat
+        lon = content.loc_lon
         if lat is None or lon is None:
             value = "Not set"
         else:
@@ -1580,174 +2162,107 @@ async def handle_admin_action(update: Update, context: ContextTypes.DEFAULT_TYPE
         await safe_edit_or_send(update, context, txt("current_map_pin", title=title, value=value), reply_markup=kb_admin_field_menu("map_pin", "admin:manage"))
         return
 
-    if data == "admin:agenda_edit":
-        db.set_user_state(user_id, "admin_edit_agenda", {"event_id": event_id})
-        await safe_edit_or_send(update, context, txt("agenda_set_prompt", title=title), reply_markup=kb_cancel("admin:agenda"))
-        return
-
-    if data == "admin:wifi_edit":
-        db.set_user_state(user_id, "admin_set_wifi", {"event_id": event_id})
-        await safe_edit_or_send(update, context, txt("wifi_set_prompt", title=title), reply_markup=kb_cancel("admin:wifi"))
-        return
-
-    if data == "admin:org_edit":
-        db.set_user_state(user_id, "admin_set_org", {"event_id": event_id})
-        await safe_edit_or_send(update, context, txt("org_set_prompt", title=title), reply_markup=kb_cancel("admin:org"))
-        return
-
-    if data == "admin:time_edit":
-        db.set_user_state(user_id, "admin_set_time", {"event_id": event_id})
-        cur = display_event_time(content.get("event_time"))
-        await safe_edit_or_send(update, context, txt("time_set_prompt", title=title, current=html_escape(cur)), reply_markup=kb_cancel("admin:time"))
-        return
-
-    if data == "admin:location_edit":
-        db.set_user_state(user_id, "admin_set_location", {"event_id": event_id})
-        loc = content.get("event_location") or "Not set"
-        await safe_edit_or_send(
-            update,
-            context,
-            txt("location_set_prompt", title=title, current=html_escape(loc)),
-            reply_markup=kb_cancel("admin:location"),
-        )
-        return
-
-    if data == "admin:map_pin_edit":
-        db.set_user_state(user_id, "admin_set_map_pin", {"event_id": event_id})
-        await safe_edit_or_send(update, context, txt("map_pin_set_prompt", title=title), reply_markup=kb_cancel("admin:map_pin"))
-        return
-
     if data == "admin:members":
-        members = db.list_members(event_id)
+        members = await adb.list_members(event_id)
         if not members:
             await safe_edit_or_send(update, context, txt("members_title", title=title, value=txt("members_none")), reply_markup=kb_admin_view(event_id, user_id))
             return
 
-        lines = []
-        for i, m in enumerate(members[:60], 1):
-            name = (m.get("full_name") or "").strip()
-            if not name:
-                name = " ".join([x for x in [m.get("first_name"), m.get("last_name")] if x]).strip()
-            uname = m.get("username")
-            phone = m.get("phone_number")
-            company = m.get("company_name")
-            ident = []
-            if uname:
-                ident.append(f"@{html_escape(uname)}")
-            if name:
-                ident.append(html_escape(name))
-            if company:
-                ident.append(html_escape(company))
-            if phone:
-                ident.append(html_escape(phone))
-            if not ident:
-                ident.append(f"ID:{m.get('telegram_id')}")
-            lines.append(f"{i}. " + " • ".join(ident))
-
-        await safe_edit_or_send(update, context, txt("members_title", title=title, value="\n".join(lines)), reply_markup=kb_admin_view(event_id, user_id))
+        await safe_edit_or_send(update, context, txt("members_title", title=title, value="\n".join(_fmt_member(i, m) for i, m in enumerate(members[:60], 1))), reply_markup=kb_admin_view(event_id, user_id))
         return
 
     if data == "admin:notify":
-        db.set_user_state(user_id, "admin_notify_text", {"event_id": event_id})
+        user_states.set(user_id, "admin_notify_text", {"event_id": event_id})
         await safe_edit_or_send(update, context, txt("push_prompt", title=title), reply_markup=kb_cancel("admin:back_to_menu"))
         return
 
     if data == "admin:alert":
-        rows = [
-            [
-                InlineKeyboardButton(btn("alert_before", m=15), callback_data="admin:alert_set:15"),
-                InlineKeyboardButton(btn("alert_before", m=30), callback_data="admin:alert_set:30"),
-            ],
-            [InlineKeyboardButton(btn("alert_before", m=60), callback_data="admin:alert_set:60")],
-            [InlineKeyboardButton(btn("back"), callback_data="admin:back_to_menu")],
-        ]
-        await safe_edit_or_send(update, context, txt("alert_menu", title=title), reply_markup=InlineKeyboardMarkup(rows))
+        await safe_edit_or_send(update, context, txt("alert_menu", title=title), reply_markup=kb_alert_menu())
         return
 
     if data.startswith("admin:alert_set:"):
         minutes = int(data.split(":")[-1])
-        et = content.get("event_time")
-        dt = datetime.fromisoformat(et) if et else None
+        dt = event_datetime(content.event_time)
         if not dt:
-            await safe_edit_or_send(update, context, txt("event_time_not_set"), reply_markup=InlineKeyboardMarkup([[InlineKeyboardButton(btn("back"), callback_data="admin:alert")]]))
+            await safe_edit_or_send(update, context, txt("event_time_not_set"), reply_markup=kb_back("admin:alert"))
             return
-        if dt.tzinfo is None:
-            dt = dt.replace(tzinfo=APP_TZ)
         run_at = dt - timedelta(minutes=minutes)
-        if run_at <= datetime.now(tz=APP_TZ):
-            await safe_edit_or_send(update, context, txt("reminder_past"), reply_markup=InlineKeyboardMarkup([[InlineKeyboardButton(btn("back"), callback_data="admin:alert")]]))
+        if run_at.timestamp() <= time.time():
+            await safe_edit_or_send(update, context, txt("reminder_past"), reply_markup=kb_back("admin:alert"))
             return
 
-        alert_id = db.add_alert(event_id, run_at.isoformat(timespec="seconds"), minutes, user_id)
+        alert_id = await adb.add_alert(event_id, run_at.isoformat(timespec="seconds"), minutes, user_id)
         schedule_alert_job(context.application, alert_id, event_id, run_at)
 
         await safe_edit_or_send(
             update,
             context,
             txt("reminder_scheduled", when=run_at.strftime("%Y-%m-%d %H:%M"), minutes=minutes),
-            reply_markup=InlineKeyboardMarkup([[InlineKeyboardButton(btn("back"), callback_data="admin:back_to_menu")]]),
+            reply_markup=kb_back("admin:back_to_menu"),
         )
         return
 
     if data == "admin:photos":
-        rows = [
-            [InlineKeyboardButton(btn("photos_view"), callback_data="admin:photos_view")],
-            [InlineKeyboardButton(btn("photos_upload"), callback_data="admin:photos_upload")],
-            [InlineKeyboardButton(btn("back"), callback_data="admin:manage")],
-        ]
-        await safe_edit_or_send(update, context, txt("photos_menu_title", title=title), reply_markup=InlineKeyboardMarkup(rows))
+        await safe_edit_or_send(update, context, txt("photos_menu_title", title=title), reply_markup=kb_photos_menu())
         return
 
     if data == "admin:photos_view":
-        photos = db.get_photos(event_id)
+        await photo_buffer.flush()
+        photos = await adb.get_photos(event_id)
         if not photos:
-            await safe_edit_or_send(update, context, txt("no_photos_yet"), reply_markup=InlineKeyboardMarkup([[InlineKeyboardButton(btn("back"), callback_data="admin:photos")]]))
+            await safe_edit_or_send(update, context, txt("no_photos_yet"), reply_markup=kb_back("admin:photos"))
             return
 
         chat_id = update.effective_chat.id
-        for i in range(0, len(photos), 10):
-            group = photos[i : i + 10]
+
+        async def send_group(group) -> None:
             if len(group) == 1:
                 await context.bot.send_photo(chat_id=chat_id, photo=group[0]["file_id"], caption=group[0]["caption"] or "")
             else:
-                media = []
-                for idx, p in enumerate(group):
-                    media.append(InputMediaPhoto(media=p["file_id"], caption=(p["caption"] if idx == 0 else None)))
+                media = [InputMediaPhoto(media=group[0]["file_id"], caption=group[0]["caption"])]
+                media += [InputMediaPhoto(media=p["file_id"]) for p in group[1:]]
                 await context.bot.send_media_group(chat_id=chat_id, media=media)
 
-        await safe_edit_or_send(update, context, txt("sent_n_photos", n=len(photos)), reply_markup=InlineKeyboardMarkup([[InlineKeyboardButton(btn("back"), callback_data="admin:photos")]]))
+        async def send_albums() -> None:
+            # Sequential on purpose: concurrent sends to one chat may arrive out of order.
+            for i in range(0, len(photos), 10):
+                await send_group(photos[i : i + 10])
+
+        # The status edit rewrites the existing menu message, so it can overlap the album sends.
+        await asyncio.gather(
+            send_albums(),
+            safe_edit_or_send(update, context, txt("sent_n_photos", n=len(photos)), reply_markup=kb_back("admin:photos")),
+        )
         return
 
     if data == "admin:photos_upload":
-        db.set_user_state(user_id, "admin_upload_photos", {"event_id": event_id})
+        user_states.set(user_id, "admin_upload_photos", {"event_id": event_id})
         await safe_edit_or_send(
             update,
             context,
             txt("upload_mode_title"),
-            reply_markup=InlineKeyboardMarkup([[InlineKeyboardButton(btn("done"), callback_data="admin:photos_done")]]),
+            reply_markup=kb_single("done", "admin:photos_done"),
         )
         return
 
     if data == "admin:photos_done":
-        db.clear_user_state(user_id)
+        user_states.clear(user_id)
         await safe_edit_or_send(update, context, txt("upload_mode_closed"), reply_markup=kb_admin_manage(event_id, user_id))
         return
 
     if data == "admin:questions":
-        qs = db.list_questions(event_id, limit=30)
+        qs = await adb.list_questions(event_id, limit=30)
         if not qs:
             await safe_edit_or_send(update, context, txt("questions_none"), reply_markup=kb_admin_view(event_id, user_id))
             return
-        lines = []
-        for qx in qs:
-            ts = (qx["created_at"] or "")[:19]
-            lines.append(f"• <b>{html_escape(ts)}</b> — {html_escape(qx['text'])}")
-        await safe_edit_or_send(update, context, txt("questions_title", title=title, value="\n".join(lines)), reply_markup=kb_admin_view(event_id, user_id))
+        # ts is an ISO timestamp truncated by the query; only the question text needs escaping.
+        value = "\n".join(f"• <b>{qx['ts']}</b> — {html_escape(qx['text'])}" for qx in qs)
+        await safe_edit_or_send(update, context, txt("questions_title", title=title, value=value), reply_markup=kb_admin_view(event_id, user_id))
         return
 
     if data == "admin:feedback":
-        summ = db.get_feedback_summary(event_id)
-        comments = db.list_feedback_comments(event_id, limit=10)
+        summ = await adb.get_feedback_summary(event_id)
+        comments = await adb.list_feedback_comments(event_id, limit=10)
         value = (
             f"👍 Positive: <b>{summ['up']}</b>\n"
             f"👎 Negative: <b>{summ['down']}</b>\n"
@@ -1762,8 +2277,7 @@ async def handle_admin_action(update: Update, context: ContextTypes.DEFAULT_TYPE
         return
 
     if data == "admin:invite":
-        link = invite_link_for(context, event_id)
-        share = "https://t.me/share/url?" + urllib.parse.urlencode({"url": link, "text": ""})
+        share = share_url_for(context, event_id)
         rows = [
             [InlineKeyboardButton("📤 Share", url=share)],
             [InlineKeyboardButton(btn("back"), callback_data="admin:back_to_menu")],
@@ -1777,8 +2291,8 @@ async def handle_admin_action(update: Update, context: ContextTypes.DEFAULT_TYPE
         return
 
     if data == "admin:delete_yes":
-        db.delete_event(event_id)
-        set_current_event_id(user_id, None)
+        await photo_buffer.flush()
+        await adb.delete_event(event_id)
         await safe_edit_or_send(update, context, txt("event_deleted"))
         return
 
@@ -1795,8 +2309,8 @@ async def handle_admin_action(update: Update, context: ContextTypes.DEFAULT_TYPE
 async def handle_participant_action(update: Update, context: ContextTypes.DEFAULT_TYPE, event_id: str, data: str):
     user = update.effective_user
     user_id = user.id
-    event = db.get_event(event_id)
-    title = html_escape(event["event_name"])
+    event = await adb.get_event(event_id)
+    title = event.title_html
 
     if data == "p:info":
         await send_event_info_with_photos(update, context, event_id)
@@ -1805,8 +2319,7 @@ async def handle_participant_action(update: Update, context: ContextTypes.DEFAUL
     
     # ✅ participant share invite (share only)
     if data == "p:share":
-        link = invite_link_for(context, event_id)
-        share = "https://t.me/share/url?" + urllib.parse.urlencode({"url": link, "text": ""})
+        share = share_url_for(context, event_id)
         rows = [
             [InlineKeyboardButton(btn("share"), url=share)],
             [InlineKeyboardButton(btn("back"), callback_data="p:back_to_menu")],
@@ -1816,38 +2329,29 @@ async def handle_participant_action(update: Update, context: ContextTypes.DEFAUL
 
 
     if data == "p:ask":
-        db.set_user_state(user_id, "p_ask_question", {"event_id": event_id})
+        user_states.set(user_id, "p_ask_question", {"event_id": event_id})
         await safe_edit_or_send(update, context, txt("ask_question_prompt", title=title), reply_markup=kb_cancel("p:back_to_menu"))
         return
 
     if data == "p:feedback":
-        rows = [
-            [InlineKeyboardButton(btn("positive"), callback_data="p:rate:1"), InlineKeyboardButton(btn("negative"), callback_data="p:rate:-1")],
-            [InlineKeyboardButton(btn("back"), callback_data="p:back_to_menu")],
-        ]
-        await safe_edit_or_send(update, context, txt("rating_choose", title=title), reply_markup=InlineKeyboardMarkup(rows))
+        await safe_edit_or_send(update, context, txt("rating_choose", title=title), reply_markup=kb_rating())
         return
 
     if data.startswith("p:rate:"):
         rating = int(data.split(":")[-1])
-        db.set_feedback(event_id, user_id, rating, comment=None)
-        db.set_user_state(user_id, "p_feedback_comment", {"event_id": event_id, "rating": rating})
+        await adb.set_feedback(event_id, user_id, rating, comment=None)
+        user_states.set(user_id, "p_feedback_comment", {"event_id": event_id, "rating": rating})
         await safe_edit_or_send(
             update,
             context,
             txt("rating_saved_optional_comment"),
-            reply_markup=InlineKeyboardMarkup(
-                [
-                    [InlineKeyboardButton(btn("skip"), callback_data="p:feedback_skip")],
-                    [InlineKeyboardButton(btn("back"), callback_data="p:back_to_menu")],
-                ]
-            ),
+            reply_markup=kb_feedback_comment(),
         )
         return
 
     if data == "p:feedback_skip":
-        db.clear_user_state(user_id)
-        await safe_edit_or_send(update, context, txt("feedback_saved"), reply_markup=InlineKeyboardMarkup([[InlineKeyboardButton(btn("back"), callback_data="p:back_to_menu")]]))
+        user_states.clear(user_id)
+        await safe_edit_or_send(update, context, txt("feedback_saved"), reply_markup=kb_back("p:back_to_menu"))
         return
 
     if data == "p:leave":
@@ -1855,8 +2359,7 @@ async def handle_participant_action(update: Update, context: ContextTypes.DEFAUL
         return
 
     if data == "p:leave_yes":
-        db.leave_event(event_id, user_id)
-        set_current_event_id(user_id, None)
+        await adb.leave_event(event_id, user_id)
         await safe_edit_or_send(update, context, txt("left_event"))
         return
 
@@ -1870,6 +2373,7 @@ async def handle_participant_action(update: Update, context: ContextTypes.DEFAUL
 # ----------------------------
 # Text / Photo / Contact / Location handlers
 # ----------------------------
+@ui_cached
 def kb_share_contact() -> ReplyKeyboardMarkup:
     return ReplyKeyboardMarkup(
         [[KeyboardButton("📱 Share phone number", request_contact=True)]],
@@ -1889,35 +2393,40 @@ async def on_text(update: Update, context: ContextTypes.DEFAULT_TYPE):
     # allow /cancel typed
     cancel_cmd = "/" + cmd("cancel")
     if text.lower() in (cancel_cmd.lower(), "cancel"):
-        db.clear_user_state(user_id)
+        user_states.clear(user_id)
         await update.message.reply_text(txt("cancelled"), parse_mode=ParseMode.HTML, reply_markup=ReplyKeyboardRemove())
         return
 
-    state, payload = db.get_user_state(user_id)
+    state, payload = user_states.get(user_id)
 
     if state == "create_event_name":
         if not text:
             await update.message.reply_text(txt("create_event_invalid_name"), parse_mode=ParseMode.HTML)
             return
-        event_id = f"EV_{secrets.token_urlsafe(8)}"
-        db.create_event(event_id, user_id, text)
-        db.ensure_participant_stub(event_id, user_id, user.username, user.first_name, user.last_name)
-        set_current_event_id(user_id, event_id)
-        db.clear_user_state(user_id)
+        # Random ids practically never collide; the primary key rejects one if it does.
+        for attempt in range(3):
+            event_id = f"EV_{secrets.token_urlsafe(8)}"
+            try:
+                await adb.create_and_enter_event(event_id, user_id, text, user.username, user.first_name, user.last_name)
+                break
+            except sqlite3.IntegrityError:
+                if attempt == 2:
+                    raise
+        user_states.clear(user_id)
         await show_event_menu(update, context, event_id, src="hub_admin")
         return
 
     if state == "reg_full_name":
         eid = payload.get("event_id")
-        if not eid or not db.event_exists(eid):
-            db.clear_user_state(user_id)
+        if not eid or not await adb.event_exists(eid):
+            user_states.clear(user_id)
             await update.message.reply_text(txt("event_not_found"), parse_mode=ParseMode.HTML)
             return
         if len(text) < 2:
             await update.message.reply_text(txt("reg_name_invalid"), parse_mode=ParseMode.HTML)
             return
         payload["full_name"] = text.strip()
-        db.set_user_state(user_id, "reg_phone", payload)
+        user_states.set(user_id, "reg_phone", payload)
         await update.message.reply_text(txt("reg_phone_prompt"), parse_mode=ParseMode.HTML, reply_markup=kb_share_contact())
         return
 
@@ -1933,29 +2442,30 @@ async def on_text(update: Update, context: ContextTypes.DEFAULT_TYPE):
             await update.message.reply_text(txt("reg_company_invalid"), parse_mode=ParseMode.HTML)
             return
 
-        db.set_registration_info(
+        await adb.set_registration_info(
             eid,
             user_id,
             full_name=payload.get("full_name", "").strip(),
             phone=payload.get("phone_number", ""),
             company=company,
         )
-        db.clear_user_state(user_id)
+        user_states.clear(user_id)
 
         await update.message.reply_text(txt("reg_saved"), parse_mode=ParseMode.HTML, reply_markup=ReplyKeyboardRemove())
         await show_event_menu(update, context, eid, src=src)
         return
 
-    current_event_id = db.get_current_event(user_id)
+    # States carry their event in the payload; the stored current event is only a fallback.
+    current_event_id = payload.get("event_id") or (await adb.get_current_event(user_id) if state else None)
 
     if state == "admin_edit_agenda":
         eid = payload.get("event_id") or current_event_id
-        if not eid or not db.is_admin(eid, user_id):
-            db.clear_user_state(user_id)
+        if not eid or not await adb.is_admin(eid, user_id):
+            user_states.clear(user_id)
             await update.message.reply_text(txt("not_allowed"), parse_mode=ParseMode.HTML)
             return
-        db.set_agenda(eid, text)
-        db.clear_user_state(user_id)
+        await adb.set_agenda(eid, text)
+        user_states.clear(user_id)
         await update.message.reply_text(txt("agenda_updated"), parse_mode=ParseMode.HTML)
         await show_event_menu(update, context, eid, src="hub_admin")
         return
@@ -1966,8 +2476,8 @@ async def on_text(update: Update, context: ContextTypes.DEFAULT_TYPE):
         if not dt:
             await update.message.reply_text(txt("time_invalid_format"), parse_mode=ParseMode.HTML)
             return
-        db.set_time(eid, dt.isoformat(timespec="seconds"))
-        db.clear_user_state(user_id)
+        await adb.set_time(eid, dt.isoformat(timespec="seconds"))
+        user_states.clear(user_id)
         await update.message.reply_text(txt("time_updated"), parse_mode=ParseMode.HTML)
         await show_event_menu(update, context, eid, src="hub_admin")
         return
@@ -1976,10 +2486,10 @@ async def on_text(update: Update, context: ContextTypes.DEFAULT_TYPE):
         eid = payload.get("event_id") or current_event_id
         t = text.strip()
         if t.lower() == "clear":
-            db.set_location(eid, None)
+            await adb.set_location(eid, None)
         else:
-            db.set_location(eid, t)
-        db.clear_user_state(user_id)
+            await adb.set_location(eid, t)
+        user_states.clear(user_id)
         await update.message.reply_text(txt("location_updated"), parse_mode=ParseMode.HTML)
         await show_event_menu(update, context, eid, src="hub_admin")
         return
@@ -1988,8 +2498,8 @@ async def on_text(update: Update, context: ContextTypes.DEFAULT_TYPE):
         eid = payload.get("event_id") or current_event_id
         t = text.strip().lower()
         if t == "clear":
-            db.clear_map_pin(eid)
-            db.clear_user_state(user_id)
+            await adb.clear_map_pin(eid)
+            user_states.clear(user_id)
             await update.message.reply_text(txt("map_pin_removed"), parse_mode=ParseMode.HTML)
             await show_event_menu(update, context, eid, src="hub_admin")
             return
@@ -2000,11 +2510,11 @@ async def on_text(update: Update, context: ContextTypes.DEFAULT_TYPE):
         eid = payload.get("event_id") or current_event_id
         ssid = None
         pwd = None
-        for line in text.splitlines():
-            if line.lower().startswith("ssid:"):
-                ssid = line.split(":", 1)[1].strip()
-            if line.lower().startswith("password:"):
-                pwd = line.split(":", 1)[1].strip()
+        for m in _WIFI_LINE_RE.finditer(text):
+            if m[1].lower() == "ssid":
+                ssid = m[2].strip()
+            else:
+                pwd = m[2].strip()
 
         if not ssid or not pwd:
             await update.message.reply_text(txt("wifi_invalid_format"), parse_mode=ParseMode.HTML)
@@ -2013,8 +2523,8 @@ async def on_text(update: Update, context: ContextTypes.DEFAULT_TYPE):
             await update.message.reply_text(txt("wifi_invalid_password"), parse_mode=ParseMode.HTML)
             return
 
-        db.set_wifi(eid, ssid, pwd)
-        db.clear_user_state(user_id)
+        await adb.set_wifi(eid, ssid, pwd)
+        user_states.clear(user_id)
         await update.message.reply_text(txt("wifi_updated"), parse_mode=ParseMode.HTML)
         await show_event_menu(update, context, eid, src="hub_admin")
         return
@@ -2022,28 +2532,15 @@ async def on_text(update: Update, context: ContextTypes.DEFAULT_TYPE):
     if state == "admin_set_org":
         eid = payload.get("event_id") or current_event_id
         fields = {"name": "", "phone": "", "email": "", "telegram": ""}
-        for line in text.splitlines():
-            line = line.strip()
-            if ":" not in line:
-                continue
-            k, v = line.split(":", 1)
-            k = k.strip().lower()
-            v = v.strip()
-            if k == "name":
-                fields["name"] = v
-            elif k == "phone":
-                fields["phone"] = v
-            elif k == "email":
-                fields["email"] = v
-            elif k == "telegram":
-                fields["telegram"] = v
+        for m in _ORG_LINE_RE.finditer(text):
+            fields[m[1].lower()] = m[2].strip()
 
         if not fields["name"]:
             await update.message.reply_text(txt("not_allowed"), parse_mode=ParseMode.HTML)
             return
 
-        db.set_organizer_info(eid, fields["name"], fields["phone"], fields["email"], fields["telegram"])
-        db.clear_user_state(user_id)
+        await adb.set_organizer_info(eid, fields["name"], fields["phone"], fields["email"], fields["telegram"])
+        user_states.clear(user_id)
         await update.message.reply_text(txt("org_updated"), parse_mode=ParseMode.HTML)
         await show_event_menu(update, context, eid, src="hub_admin")
         return
@@ -2051,18 +2548,18 @@ async def on_text(update: Update, context: ContextTypes.DEFAULT_TYPE):
     if state == "admin_notify_text":
         eid = payload.get("event_id") or current_event_id
         await send_broadcast(update, context, eid, message_text=text, photo_file_id=None)
-        db.clear_user_state(user_id)
+        user_states.clear(user_id)
         await show_event_menu(update, context, eid, src="hub_admin")
         return
 
     if state == "p_ask_question":
         eid = payload.get("event_id") or current_event_id
-        if not eid or not db.event_exists(eid):
-            db.clear_user_state(user_id)
+        if not eid or not await adb.event_exists(eid):
+            user_states.clear(user_id)
             await update.message.reply_text(txt("event_not_found"), parse_mode=ParseMode.HTML)
             return
-        db.add_question(eid, user_id, text)
-        db.clear_user_state(user_id)
+        await adb.add_question(eid, user_id, text)
+        user_states.clear(user_id)
         await update.message.reply_text(txt("question_sent"), parse_mode=ParseMode.HTML)
         await show_event_menu(update, context, eid, src="hub_joined")
         return
@@ -2074,8 +2571,8 @@ async def on_text(update: Update, context: ContextTypes.DEFAULT_TYPE):
         if not comment:
             await update.message.reply_text(txt("comment_empty"), parse_mode=ParseMode.HTML)
             return
-        db.set_feedback(eid, user_id, rating, comment=comment)
-        db.clear_user_state(user_id)
+        await adb.set_feedback(eid, user_id, rating, comment=comment)
+        user_states.clear(user_id)
         await update.message.reply_text(txt("comment_saved"), parse_mode=ParseMode.HTML)
         await show_event_menu(update, context, eid, src="hub_joined")
         return
@@ -2091,7 +2588,7 @@ async def on_contact(update: Update, context: ContextTypes.DEFAULT_TYPE):
         return
 
     user_id = user.id
-    state, payload = db.get_user_state(user_id)
+    state, payload = user_states.get(user_id)
     if state != "reg_phone":
         return
 
@@ -2105,7 +2602,7 @@ async def on_contact(update: Update, context: ContextTypes.DEFAULT_TYPE):
         return
 
     payload["phone_number"] = phone
-    db.set_user_state(user_id, "reg_company", payload)
+    user_states.set(user_id, "reg_company", payload)
     await msg.reply_text(txt("reg_company_prompt"), parse_mode=ParseMode.HTML, reply_markup=ReplyKeyboardRemove())
 
 
@@ -2117,20 +2614,20 @@ async def on_location(update: Update, context: ContextTypes.DEFAULT_TYPE):
         return
 
     user_id = user.id
-    state, payload = db.get_user_state(user_id)
+    state, payload = user_states.get(user_id)
     if state != "admin_set_map_pin":
         return
 
-    eid = payload.get("event_id") or db.get_current_event(user_id)
-    if not eid or not db.is_admin(eid, user_id):
-        db.clear_user_state(user_id)
+    eid = payload.get("event_id") or await adb.get_current_event(user_id)
+    if not eid or not await adb.is_admin(eid, user_id):
+        user_states.clear(user_id)
         return
 
     lat = msg.location.latitude
     lon = msg.location.longitude
-    db.set_map_pin(eid, lat, lon)
+    await adb.set_map_pin(eid, lat, lon)
 
-    db.clear_user_state(user_id)
+    user_states.clear(user_id)
     await msg.reply_text(txt("map_pin_saved"), parse_mode=ParseMode.HTML)
     await show_event_menu(update, context, eid, src="hub_admin")
 
@@ -2142,30 +2639,30 @@ async def on_photo(update: Update, context: ContextTypes.DEFAULT_TYPE):
         return
     user_id = user.id
 
-    state, payload = db.get_user_state(user_id)
-    current_event_id = db.get_current_event(user_id)
+    state, payload = user_states.get(user_id)
+    current_event_id = payload.get("event_id") or (await adb.get_current_event(user_id) if state else None)
 
     if state == "admin_upload_photos":
         eid = payload.get("event_id") or current_event_id
-        if not eid or not db.is_admin(eid, user_id):
-            db.clear_user_state(user_id)
+        if not eid or not await adb.is_admin(eid, user_id):
+            user_states.clear(user_id)
             await update.message.reply_text(txt("not_allowed"), parse_mode=ParseMode.HTML)
             return
         photo = update.message.photo[-1]
         caption = update.message.caption
-        db.add_photo(eid, photo.file_id, caption)
+        photo_buffer.add(eid, photo.file_id, caption)
         await update.message.reply_text(txt("photo_saved_send_more"), parse_mode=ParseMode.HTML)
         return
 
     if state == "admin_notify_text":
         eid = payload.get("event_id") or current_event_id
-        if not eid or not db.is_admin(eid, user_id):
-            db.clear_user_state(user_id)
+        if not eid or not await adb.is_admin(eid, user_id):
+            user_states.clear(user_id)
             return
         photo = update.message.photo[-1]
         caption = update.message.caption or ""
         await send_broadcast(update, context, eid, message_text=caption, photo_file_id=photo.file_id)
-        db.clear_user_state(user_id)
+        user_states.clear(user_id)
         await show_event_menu(update, context, eid, src="hub_admin")
         return
 
@@ -2175,6 +2672,11 @@ async def on_photo(update: Update, context: ContextTypes.DEFAULT_TYPE):
 # ----------------------------
 # Broadcast / notifications
 # ----------------------------
+# Reminders for one event that are due within this window after a restart get staggered.
+ALERT_JITTER_WINDOW = timedelta(seconds=60)
+ALERT_JITTER_STEP_MS = 500
+
+
 async def send_broadcast(
     update: Update,
     context: ContextTypes.DEFAULT_TYPE,
@@ -2182,13 +2684,13 @@ async def send_broadcast(
     message_text: str,
     photo_file_id: Optional[str] = None,
 ):
-    event = db.get_event(event_id)
+    event = await adb.get_event(event_id)
     if not event:
         await update.effective_chat.send_message(txt("event_not_found"))
         return
 
-    admin_id = event["admin_id"]
-    ids = db.get_participant_telegram_ids(event_id)
+    admin_id = event.admin_id
+    ids = await adb.get_participant_telegram_ids(event_id)
     recipient_ids = [pid for pid in ids if pid and pid != admin_id]
 
     if not recipient_ids:
@@ -2205,25 +2707,24 @@ async def send_broadcast(
     except Exception:
         pass
 
-    success = 0
-    fail = 0
-    batch_size = 25
-    delay = 1.0
+    # Sends run concurrently; the application's rate limiter keeps them under Telegram's caps.
+    sem = context.bot_data["fanout_sem"]
 
-    for i in range(0, len(recipient_ids), batch_size):
-        batch = recipient_ids[i : i + batch_size]
-        for pid in batch:
+    async def send_one(pid: int) -> bool:
+        async with sem:
             try:
                 if photo_file_id:
                     await context.bot.send_photo(chat_id=pid, photo=photo_file_id, caption=final_text)
                 else:
                     await context.bot.send_message(chat_id=pid, text=final_text)
-                success += 1
+                return True
             except Exception as e:
-                logger.warning(f"Broadcast failed to {pid}: {e}")
-                fail += 1
-        if i + batch_size < len(recipient_ids):
-            await asyncio.sleep(delay)
+                logger.warning("Broadcast failed to %s: %s", pid, e)
+                return False
+
+    results = await asyncio.gather(*(send_one(pid) for pid in recipient_ids))
+    success = sum(results)
+    fail = len(results) - success
 
     await update.effective_chat.send_message(txt("broadcast_done", success=success, fail=fail))
 
@@ -2239,9 +2740,9 @@ def schedule_alert_job(app: Application, alert_id: int, event_id: str, run_at: d
             data={"alert_id": alert_id, "event_id": event_id},
             name=f"alert:{alert_id}",
         )
-        logger.info(f"Scheduled alert {alert_id} for {run_at.isoformat()}")
+        logger.info("Scheduled alert %s for %s", alert_id, run_at)
     except Exception as e:
-        logger.warning(f"Failed to schedule alert job: {e}")
+        logger.warning("Failed to schedule alert job: %s", e)
 
 
 async def job_send_alert(context: ContextTypes.DEFAULT_TYPE):
@@ -2249,58 +2750,100 @@ async def job_send_alert(context: ContextTypes.DEFAULT_TYPE):
     alert_id = int(data.get("alert_id"))
     event_id = data.get("event_id")
 
-    event = db.get_event(event_id)
+    event = await adb.get_event(event_id)
     if not event:
-        db.mark_alert_sent(alert_id)
+        await adb.mark_alert_sent(alert_id)
         return
 
-    content = db.get_event_content(event_id)
-    admin_id = event["admin_id"]
+    content = await adb.get_event_content(event_id)
+    admin_id = event.admin_id
 
-    ids = db.get_participant_telegram_ids(event_id)
+    ids = await adb.get_participant_telegram_ids(event_id)
     recipient_ids = [pid for pid in ids if pid and pid != admin_id]
     if not recipient_ids:
-        db.mark_alert_sent(alert_id)
+        await adb.mark_alert_sent(alert_id)
         return
 
-    tm = display_event_time(content.get("event_time"))
-    loc = content.get("event_location") or "Not set"
+    tm = display_event_time(content.event_time)
+    loc = content.event_location or "Not set"
     msg = (
-        f"⏰ Reminder: <b>{html_escape(event['event_name'])}</b>\n"
+        f"⏰ Reminder: <b>{event.title_html}</b>\n"
         f"Time: <b>{html_escape(tm)}</b>\n"
         f"Location: <b>{html_escape(loc)}</b>"
     )
 
-    for pid in recipient_ids:
-        try:
-            await context.bot.send_message(chat_id=pid, text=msg, parse_mode=ParseMode.HTML)
-        except Exception as e:
-            logger.warning(f"Alert send failed to {pid}: {e}")
+    # Same concurrency budget as send_broadcast; the rate limiter paces the actual requests.
+    sem = context.bot_data["fanout_sem"]
 
-    db.mark_alert_sent(alert_id)
+    async def send_one(pid: int) -> None:
+        async with sem:
+            try:
+                await context.bot.send_message(chat_id=pid, text=msg, parse_mode=ParseMode.HTML)
+            except Exception as e:
+                logger.warning("Alert send failed to %s: %s", pid, e)
 
+    await asyncio.gather(*(send_one(pid) for pid in recipient_ids))
 
-async def post_init(application: Application):
-    load_ui()
+    await adb.mark_alert_sent(alert_id)
+
+
+async def job_flush_user_states(context: ContextTypes.DEFAULT_TYPE):
     try:
-        me = await application.bot.get_me()
-        application.bot_data["bot_username"] = me.username
+        await user_states.flush()
     except Exception as e:
-        logger.warning(f"get_me failed at startup: {e}")
+        logger.warning("User state flush failed: %s", e)
+
+
+async def job_db_maintenance(context: ContextTypes.DEFAULT_TYPE):
+    try:
+        await adb.maintain()
+    except Exception as e:
+        logger.warning("Database maintenance failed: %s", e)
+
 
-    alerts = db.list_future_alerts()
+async def post_init(application: Application):
+    load_ui()
+    await user_states.load()
+    application.job_queue.run_repeating(job_flush_user_states, interval=30, first=30)
+    application.job_queue.run_repeating(job_db_maintenance, interval=3600, first=3600)
+    # Application.initialize() has already called getMe; reuse that instead of asking again.
+    application.bot_data["bot_username"] = application.bot.username
+    # One budget shared by every fan-out, so broadcasts and reminders firing together don't
+    # each open their own 20 in-flight sends. Created here, on the loop that runs the bot.
+    application.bot_data["fanout_sem"] = asyncio.Semaphore(20)
+
+    # Alerts live in the job queue from here on; the table is only read this once at startup.
+    alerts = await adb.list_future_alerts()
     now = datetime.now(tz=APP_TZ)
+    missed: List[int] = []
+    due_soon: Dict[str, int] = {}
     for a in alerts:
+        run_at = event_datetime(a["run_at_iso"])
+        if run_at is None:
+            logger.warning("Failed to reschedule alert %s: bad run_at %r", a["id"], a["run_at_iso"])
+            continue
         try:
-            run_at = datetime.fromisoformat(a["run_at_iso"])
-            if run_at.tzinfo is None:
-                run_at = run_at.replace(tzinfo=APP_TZ)
             if run_at > now:
+                if run_at - now < ALERT_JITTER_WINDOW:
+                    # Several reminders for one event about to fire together: stagger all but
+                    # the first by a bounded random delay so their fan-outs don't pile up.
+                    index = due_soon.get(a["event_id"], 0)
+                    due_soon[a["event_id"]] = index + 1
+                    if index:
+                        run_at += timedelta(milliseconds=random.randint(0, ALERT_JITTER_STEP_MS) * index)
                 schedule_alert_job(application, a["id"], a["event_id"], run_at)
             else:
-                db.mark_alert_sent(a["id"])
+                missed.append(a["id"])
         except Exception as e:
-            logger.warning(f"Failed to reschedule alert {a}: {e}")
+            logger.warning("Failed to reschedule alert %s: %s", a["id"], e)
+    if missed:
+        await adb.mark_alerts_sent(missed)
+
+
+async def post_shutdown(application: Application):
+    await photo_buffer.flush(retry=False)
+    await user_states.flush()
+    await adb.maintain()
 
 
 async def on_error(update: object, context: ContextTypes.DEFAULT_TYPE) -> None:
@@ -2310,25 +2853,79 @@ async def on_error(update: object, context: ContextTypes.DEFAULT_TYPE) -> None:
 # ----------------------------
 # Run
 # ----------------------------
+class PlainTextFilter(filters.MessageFilter):
+    """filters.TEXT & ~filters.COMMAND as a single check instead of a merged filter tree."""
+
+    __slots__ = ()
+
+    def filter(self, message) -> bool:
+        if not message.text:
+            return False
+        entities = message.entities
+        return not (entities and entities[0].type == MessageEntityType.BOT_COMMAND and entities[0].offset == 0)
+
+
 def main():
     if not BOT_TOKEN:
         raise RuntimeError("BOT_TOKEN is missing. Put it in .env as BOT_TOKEN=...")
 
-    # Increase network timeouts (Telegram can be slow sometimes)
+    # uvloop is optional (no Windows build); run_polling creates its loop from this policy.
+    try:
+        import uvloop
+
+        asyncio.set_event_loop_policy(uvloop.EventLoopPolicy())
+    except ImportError:
+        pass
+
+    # Handler I/O (stream/file writes) runs on a listener thread. QueueHandler.prepare() still
+    # formats the message and any traceback on the calling (event loop) thread.
+    root_logger = logging.getLogger()
+    log_queue: "queue.SimpleQueue[logging.LogRecord]" = queue.SimpleQueue()
+    log_listener = logging.handlers.QueueListener(log_queue, *root_logger.handlers, respect_handler_level=True)
+    root_logger.handlers = [logging.handlers.QueueHandler(log_queue)]
+    log_listener.start()
+
+    # Increase network timeouts (Telegram can be slow sometimes).
+    # A custom HTTPXRequest defaults to a single pooled connection, which serializes
+    # every concurrent edit/answer/send; size it for concurrent handlers instead.
+    # HTTP/2 multiplexes concurrent calls over a few TLS sessions instead of one per request.
     request = HTTPXRequest(
+        connection_pool_size=256,
+        connect_timeout=30,
+        read_timeout=60,
+        write_timeout=30,
+        pool_timeout=30,
+        http_version="2",
+    )
+    # getUpdates gets its own connection so long polls never occupy a send slot.
+    get_updates_request = HTTPXRequest(
+        connection_pool_size=1,
         connect_timeout=30,
         read_timeout=60,
         write_timeout=30,
         pool_timeout=30,
     )
 
+    # Every Bot API call goes through one limiter: 28 msg/s overall (Telegram caps at 30),
+    # 20 msg/min per group chat, and a RetryAfter pauses all senders before retrying.
+    rate_limiter = AIORateLimiter(
+        overall_max_rate=28,
+        overall_time_period=1,
+        group_max_rate=20,
+        group_time_period=60,
+        max_retries=3,
+    )
+
     my_defaults = Defaults(tzinfo=APP_TZ)
     application = (
         Application.builder()
         .token(BOT_TOKEN)
         .defaults(my_defaults)
         .request(request)          # ✅ timeouts applied here
+        .get_updates_request(get_updates_request)
+        .rate_limiter(rate_limiter)
         .post_init(post_init)
+        .post_shutdown(post_shutdown)
         .build()
     )
 
@@ -2341,15 +2938,23 @@ def main():
     application.add_handler(MessageHandler(filters.PHOTO, on_photo))
     application.add_handler(MessageHandler(filters.LOCATION, on_location))
     application.add_handler(MessageHandler(filters.CONTACT, on_contact))
-    application.add_handler(MessageHandler(filters.TEXT & ~filters.COMMAND, on_text))
+    application.add_handler(MessageHandler(PlainTextFilter(), on_text))
 
     application.add_error_handler(on_error)
 
     logger.info("EventCompanion v2 starting…")
-    application.run_polling(
-        allowed_updates=Update.ALL_TYPES,
-        drop_pending_updates=True,
-    )
+    # Long polling: Telegram holds each getUpdates open for up to 30s (under the 60s read
+    # timeout), so an idle bot makes a couple of requests a minute instead of one every 10s.
+    # Messages sent while the bot was down are still delivered: Telegram keeps the offset
+    # server-side and PTB confirms the last handled update on shutdown, so nothing replays.
+    try:
+        application.run_polling(
+            allowed_updates=Update.ALL_TYPES,
+            drop_pending_updates=False,
+            timeout=30,
+        )
+    finally:
+        log_listener.stop()
 
 
 